@@ -60,7 +60,7 @@ class TradingBot:
         if self.mode == "paper": 
             self.broker = PaperBroker( 
                 starting_balance=initial_balance,
-                data_path=self.config["exchange"].get("data_path", "data/btc_usdt_features.csv"), 
+                data_path=self.config["exchange"].get("data_path", "data/btc_usdt_features.parquet"), 
             ) 
             self.state = StateStore( 
                 path="state/paper_state.json", 
@@ -217,10 +217,12 @@ class TradingBot:
                 }, 
             )
 
+            # Only the latest 20-bar average is logged: mean of the tail, not a full rolling pass
+            vol_avg = df["volume"].iloc[-20:].mean()
             self.logger.info( 
                 f"Regime={latest['regime']} | Intent={latest_intent['intent']} | " 
                 f"TrendSignal={trend_signals.iloc[-1]['signal']} | " 
-                f"Volume={latest['volume']} vs avg={df['volume'].rolling(20).mean().iloc[-1]}" 
+                f"Volume={latest['volume']} vs avg={vol_avg}" 
             )
 
         except Exception as e:
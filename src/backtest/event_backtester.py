@@ -146,21 +146,17 @@ class EventBacktester:
 
 
 if __name__ == "__main__":
-    df = pd.read_csv(
-        "data/btc_usdt_features.csv",
-        index_col=0,
-        parse_dates=True,
-    )
+    df = pd.read_parquet("data/btc_usdt_features.parquet")
 
     # --- Automatically find the most recent final_intent file ---
-    files = glob.glob("data/final_intent_*.csv")
+    files = glob.glob("data/final_intent_*.parquet")
     if not files:
         raise FileNotFoundError("No final_intent files found in data/ directory.")
 
     latest_file = max(files, key=os.path.getctime)
     print(f"Loading latest intent file: {latest_file}")
 
-    intent = pd.read_csv(latest_file, index_col=0, parse_dates=True)
+    intent = pd.read_parquet(latest_file)
 
     bt = EventBacktester(initial_capital=500)
     results = bt.run(df, intent)
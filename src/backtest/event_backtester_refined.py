@@ -1,4 +1,5 @@
 from curses import window
+import numpy as np
 import pandas as pd
 import glob
 import os
@@ -35,6 +36,14 @@ class EventBacktester:
             (0.30, 3.0),  # exit remaining 25% at 3R 20
             (0.50, None), # exit remaining 50% at final exit 20
         ]
+        # Adaptive ladder used in GREED (same R-multiples, heavier early capture)
+        self.greed_exit_levels = [
+            (0.50, 1.0),
+            (0.30, 2.0),
+            (0.20, 3.0),
+            (0.0, None),   # 50% trailing
+        ]
+        #40/30/15/15 (Aggressive early capture), 25/25/25/25 (Even distribution),20/30/20/30 (Trend‑biased capture),50/30/20/0* (No trailing, pure lock‑in),15/25/25/35 (Max trend capture with protection), 50,40,10,0 (Very aggressive early capture)
 
         # Monitoring 
         self.logger = setup_logger("EventBacktester", "event_backtester.log") 
@@ -42,16 +51,19 @@ class EventBacktester:
 
     def run(self, df: pd.DataFrame, intent: pd.DataFrame, partial_exit_levels: list = None ) -> pd.DataFrame:
         equity = self.initial_capital
-        peak_equity = equity
 
         position = None
         entry_price = None
         stop_price = None
         position_size = 0.0
         source = None
-        partial_exits_taken = set()
         results = []
 
+        # --- Partial-exit ladders (resolved once; trailing leg handled by stops) ---
+        base_levels = [lvl for lvl in (partial_exit_levels or self.partial_exit_levels) if lvl[1] is not None]
+        greed_levels = [lvl for lvl in (partial_exit_levels or self.greed_exit_levels) if lvl[1] is not None]
+        partial_exits_taken = set()  # R-multiples already exited, whichever ladder hit them
+
         def sentiment_bucket(val):
             if val <= 0.20:
                 return "EXTREME_FEAR"
@@ -87,7 +99,6 @@ class EventBacktester:
                         "pnl": 0.0,
                         "pnl_pct": 0.0,
                         "equity": equity,
-                        "drawdown": (peak_equity - equity) / peak_equity if peak_equity > 0 else 0.0,
                         "source": "BLOCKED",
                         "sentiment_bucket": sent_bucket,
                         "regime": row.get("regime", None),
@@ -142,41 +153,30 @@ class EventBacktester:
 
                 sentiment = row.get("sentiment_norm")
 
-                levels = partial_exit_levels or self.partial_exit_levels
                 # --- Adaptive partial exit levels based on sentiment ---
+                levels = base_levels
                 if sentiment is not None and 0.80 <= sentiment < 0.90:  # GREED only
-                    levels = partial_exit_levels or [
-                        (0.50, 1.0),
-                        (0.30, 2.0),
-                        (0.20, 3.0),
-                        (0.0, None),   # 50% trailing
-                    ]
-                #40/30/15/15 (Aggressive early capture), 25/25/25/25 (Even distribution),20/30/20/30 (Trend‑biased capture),50/30/20/0* (No trailing, pure lock‑in),15/25/25/35 (Max trend capture with protection), 50,40,10,0 (Very aggressive early capture)
-
-
+                    levels = greed_levels
 
+                high = row["high"]
+                risk_per_unit = entry_price - stop_price
                 for ratio, multiple in levels:
-                    if multiple is None:
-                        continue  # skip trailing exit in this loop
                     if multiple in partial_exits_taken:
                         continue
-                    r_target = entry_price + (entry_price - stop_price) * multiple
-                    if row["high"] >= r_target:
+                    r_target = entry_price + risk_per_unit * multiple
+                    if high >= r_target:
                         exit_price = r_target * (1 - self.slippage)
                         partial_size = position_size * ratio
                         pnl = partial_size * (exit_price - entry_price)
                         pnl_pct = pnl / equity if equity != 0 else 0.0
                         fee_cost = abs(partial_size * exit_price) * self.fee
                         equity += pnl - fee_cost
-                        peak_equity = max(peak_equity, equity)
-                        drawdown = (peak_equity - equity) / peak_equity if peak_equity > 0 else 0.0
                         results.append({
                             "timestamp": df.index[i],
                             "exit_type": f"PARTIAL_{multiple}R",
                             "pnl": pnl,
                             "pnl_pct": pnl_pct,
                             "equity": equity,
-                            "drawdown": drawdown,
                             "source": source if source is not None else "UNKNOWN",
                             "sentiment_bucket": sent_bucket,
                             "regime": row.get("regime", None),  
@@ -242,15 +242,12 @@ class EventBacktester:
                 pnl_pct = pnl / equity if equity != 0 else 0.0
                 fee_cost = abs(position_size * exit_price) * self.fee
                 equity += pnl - fee_cost
-                peak_equity = max(peak_equity, equity)
-                drawdown = (peak_equity - equity) / peak_equity if peak_equity > 0 else 0.0
                 results.append({
                     "timestamp": df.index[i],
                     "exit_type": "STOP",
                     "pnl": pnl,
                     "pnl_pct": pnl_pct,
                     "equity": equity,
-                    "drawdown": drawdown,
                     "source": source if source is not None else "UNKNOWN",
                     "sentiment_bucket": sent_bucket,
                     "regime": row.get("regime", None),  
@@ -273,8 +270,6 @@ class EventBacktester:
                 pnl = position_size * (exit_price - entry_price)
                 fee_cost = abs(position_size * exit_price) * self.fee
                 equity += pnl - fee_cost
-                peak_equity = max(peak_equity, equity)
-                drawdown = (peak_equity - equity) / peak_equity if peak_equity > 0 else 0.0
                 pnl_pct = pnl / equity if equity != 0 else 0.0
                 results.append({
                     "timestamp": df.index[i],
@@ -282,7 +277,6 @@ class EventBacktester:
                     "pnl": pnl,
                     "pnl_pct": pnl_pct,
                     "equity": equity,
-                    "drawdown": drawdown,
                     "source": source if source is not None else "UNKNOWN",
                     "sentiment_bucket": sent_bucket,
                     "regime": row.get("regime", None),  
@@ -301,12 +295,19 @@ class EventBacktester:
                 "pnl": 0.0,
                 "pnl_pct": 0.0,
                 "equity": equity,
-                "drawdown": (peak_equity - equity) / peak_equity if peak_equity > 0 else 0.0,
                 "source": source if source is not None else "UNKNOWN",
                 "sentiment_bucket": sent_bucket,
                 "regime": row.get("regime", None),  
             })
         df_results = pd.DataFrame(results)
+
+        # --- Drawdown in one pass over the recorded equity path ---
+        if not df_results.empty:
+            equity_arr = df_results["equity"].to_numpy(dtype="float64")
+            peak = np.maximum(np.maximum.accumulate(equity_arr), self.initial_capital)
+            drawdown = np.divide(peak - equity_arr, peak, out=np.zeros_like(peak), where=peak > 0)
+            df_results.insert(df_results.columns.get_loc("equity") + 1, "drawdown", drawdown)
+
         print("Results columns:", df_results.columns)
         return df_results
 
@@ -438,20 +439,16 @@ def test_exit_strategies(df, intent, backtester):
 
 
 if __name__ == "__main__":
-    df = pd.read_csv(
-        "data/btc_usdt_features.csv",
-        index_col=0,
-        parse_dates=True,
-    )
+    df = pd.read_parquet("data/btc_usdt_features.parquet")
 
-    files = glob.glob("data/final_intent_*.csv")
+    files = glob.glob("data/final_intent_*.parquet")
     if not files:
         raise FileNotFoundError("No final_intent files found in data/ directory.")
 
     latest_file = max(files, key=os.path.getctime)
     print(f"Loading latest intent file: {latest_file}")
 
-    intent = pd.read_csv(latest_file, index_col=0, parse_dates=True)
+    intent = pd.read_parquet(latest_file)
 
     logger = setup_logger("Backtest", "backtest.log") 
     alerts = AlertManager(logger)
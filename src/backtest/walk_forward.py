@@ -95,11 +95,7 @@ class WalkForwardTester:
 
 # --- Temporary runner ---
 if __name__ == "__main__":
-    df = pd.read_csv(
-        "data/btc_usdt_features.csv",
-        index_col=0,
-        parse_dates=True,
-    )
+    df = pd.read_parquet("data/btc_usdt_features.parquet")
 
     wf = WalkForwardTester()
     results = wf.run(df)
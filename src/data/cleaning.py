@@ -1,38 +1,64 @@
+import numpy as np
 import pandas as pd
 import os # Import os for directory creation/checking
 
+from src.data.storage import write_parquet
 
-def clean_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+
+def clean_ohlcv(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
     """
     Cleans OHLCV data:
     - Ensures datetime index
     - Sorts chronologically
     - Removes duplicates
     - Casts numeric columns
+
+    inplace=True mutates the caller's dataframe; otherwise a shallow copy
+    is taken (no data memcpy).
     """
-    df = df.copy()
+    if not inplace:
+        df = df.copy(deep=False)
 
     # Ensure datetime index
     if not isinstance(df.index, pd.DatetimeIndex):
         # If the index isn't a datetime index yet, try to convert it
         df.index = pd.to_datetime(df.index, utc=True)
 
-    # Sort by time
-    df.sort_index(inplace=True)
+    # Sort by time (stable, so "first" duplicate is the first seen);
+    # exchange and cached data usually arrive sorted already
+    if not df.index.is_monotonic_increasing:
+        df.sort_index(inplace=True, kind="mergesort")
 
     # Remove duplicate timestamps
-    df = df[~df.index.duplicated(keep="first")]
+    df = drop_duplicate_timestamps(df)
 
     # Enforce numeric types
-    numeric_cols = ["open", "high", "low", "close", "volume"]
-    for col in numeric_cols:
-        if col in df.columns:
-            # Use errors='coerce' to turn anything that can't be a number into NaN
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+    numeric_cols = [c for c in ["open", "high", "low", "close", "volume"] if c in df.columns]
+    # Fast path: freshly downloaded data is already numeric
+    if not all(pd.api.types.is_numeric_dtype(df[c]) for c in numeric_cols):
+        # Use errors='coerce' to turn anything that can't be a number into NaN
+        df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors="coerce")
 
     return df
 
 
+def drop_duplicate_timestamps(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drop repeated timestamps from a time-sorted dataframe, keeping the first.
+    Duplicates are adjacent once sorted, so one int64 compare replaces the
+    hashtable pass of Index.duplicated().
+    """
+    idx_i8 = df.index.asi8
+    if len(idx_i8) < 2:
+        return df
+    keep = np.empty(len(idx_i8), dtype=bool)
+    keep[0] = True
+    np.not_equal(idx_i8[1:], idx_i8[:-1], out=keep[1:])
+    if keep.all():
+        return df
+    return df.iloc[keep]
+
+
 def detect_missing_candles(df: pd.DataFrame, timeframe: str) -> pd.DataFrame:
     """
     Detect missing candles without filling them.
@@ -55,16 +81,29 @@ def detect_missing_candles(df: pd.DataFrame, timeframe: str) -> pd.DataFrame:
     return pd.DataFrame(index=missing)
 
 
-def forward_fill_volume_zero(df: pd.DataFrame) -> pd.DataFrame:
+def forward_fill_volume_zero(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
     """
     Forward-fill OHLC values ONLY if volume is zero.
     This handles rare exchange glitches.
     """
-    df = df.copy()
-    zero_volume = df["volume"] == 0
+    if not inplace:
+        df = df.copy(deep=False)
+    zero_volume = df["volume"].to_numpy() == 0
+    if not zero_volume.any():
+        return df
+
     ohlc_cols = ["open", "high", "low", "close"]
-    # Only apply ffill where volume is exactly zero
-    df.loc[zero_volume, ohlc_cols] = df.loc[zero_volume, ohlc_cols].ffill()
+    vals = df[ohlc_cols].to_numpy(dtype="float64", copy=True)
+
+    # Row of the last traded candle at or before each row (whole-frame ffill
+    # of positions), then pull OHLC from it only where volume is exactly zero
+    src_row = np.where(zero_volume, 0, np.arange(len(vals)))
+    np.maximum.accumulate(src_row, out=src_row)
+    # Leading zero-volume rows have no traded candle to copy from
+    fill = zero_volume & ~zero_volume[src_row]
+    vals[fill] = vals[src_row[fill]]
+
+    df[ohlc_cols] = vals
     return df
 
 # --- NEW FUNCTION TO HANDLE THE FULL PROCESS ---
@@ -73,37 +112,34 @@ def process_and_save_data(input_path: str, output_path: str, timeframe: str):
     print(f"--- Starting processing for {input_path} (Timeframe: {timeframe}) ---")
 
     # Load data
-    df = pd.read_csv(
-        input_path,
-        index_col=0,
-        parse_dates=True,
-    )
+    df = pd.read_parquet(input_path)
 
     # Clean the data
-    df_clean = clean_ohlcv(df)
+    # Freshly read frame has no other owner: clean it in place
+    df_clean = clean_ohlcv(df, inplace=True)
     
     # Detect missing candles (for informational purposes)
     missing = detect_missing_candles(df_clean, timeframe=timeframe)
     print(f"  Missing candles detected: {len(missing)}")
 
     # Handle zero volume glitches
-    df_clean = forward_fill_volume_zero(df_clean)
+    df_clean = forward_fill_volume_zero(df_clean, inplace=True)
 
     # Ensure the output directory exists
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
     # Save the clean data back to a file
-    df_clean.to_csv(output_path)
+    write_parquet(df_clean, output_path)
     print(f"  Successfully cleaned and saved to {output_path}")
     print(f"  Total rows saved: {len(df_clean)}\n")
 
 
 if __name__ == "__main__":
     # Define file paths
-    path_4h_in = "data/btc_usdt_4h.csv"
-    path_4h_out = "data/btc_usdt_4h.csv"
-    path_1d_in = "data/btc_usdt_1d.csv"
-    path_1d_out = "data/btc_usdt_1d.csv"
+    path_4h_in = "data/btc_usdt_4h.parquet"
+    path_4h_out = "data/btc_usdt_4h.parquet"
+    path_1d_in = "data/btc_usdt_1d.parquet"
+    path_1d_out = "data/btc_usdt_1d.parquet"
 
     # Process both timeframes using the new function
     process_and_save_data(path_4h_in, path_4h_out, timeframe="4h")
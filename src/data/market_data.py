@@ -1,10 +1,43 @@
-import ccxt
+import asyncio
+import ccxt.async_support as ccxt_async
 import pandas as pd
 from datetime import datetime, timezone
 import time
 import os
 from typing import Optional
 
+from src.data.cleaning import drop_duplicate_timestamps
+from src.data.storage import write_csv, write_parquet
+
+
+class TokenBucket:
+    """
+    Async token bucket: at most `rate` acquisitions per `period` seconds,
+    bursting up to `rate` when tokens have accumulated. Waits only when
+    the bucket is empty, instead of sleeping a fixed interval per call.
+    """
+
+    def __init__(self, rate: int, period: float = 1.0):
+        self.capacity = float(rate)
+        self.tokens = float(rate)
+        self.fill_rate = rate / period
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return self
+                await asyncio.sleep((1 - self.tokens) / self.fill_rate)
+
+    async def __aexit__(self, *exc):
+        return False
+
 
 class MarketDataDownloader:
     def __init__(
@@ -14,15 +47,13 @@ class MarketDataDownloader:
         timeframe: str = "4h",
         since: Optional[str] = None,
         limit: int = 1000,
+        cache_path: Optional[str] = None,
     ):
         self.exchange_name = exchange_name
         self.symbol = symbol
         self.timeframe = timeframe
         self.limit = limit
-
-        self.exchange = getattr(ccxt, exchange_name)({
-            "enableRateLimit": True,
-        })
+        self.cache_path = cache_path
 
         self.since = (
             int(pd.Timestamp(since, tz="UTC").timestamp() * 1000)
@@ -31,34 +62,20 @@ class MarketDataDownloader:
         )
 
     def fetch_ohlcv(self) -> pd.DataFrame:
-        all_candles = []
-        since = self.since
-
         # Print a message to indicate which timeframe is being downloaded
         print(f"Starting download for {self.symbol} with timeframe {self.timeframe}...")
 
-        while True:
-            candles = self.exchange.fetch_ohlcv(
-                symbol=self.symbol,
-                timeframe=self.timeframe,
-                since=since,
-                limit=self.limit,
-            )
-
-            if not candles:
-                break
+        # Resume from the cached history. The last cached candle is fetched again:
+        # it may have been the still-forming bar when it was saved
+        cached = None
+        if self.cache_path and os.path.exists(self.cache_path):
+            cached = pd.read_parquet(self.cache_path)
+            if not cached.empty:
+                self.since = int(cached.index.max().timestamp() * 1000)
+                print(f"  Resuming from cache {self.cache_path} ({len(cached)} rows)")
 
-            all_candles.extend(candles)
-            # Use the timestamp of the last candle to fetch the next batch
-            since = candles[-1][0] + 1
+        all_candles = asyncio.run(self._fetch_pages())
 
-            # Respect rate limits
-            # time.sleep(self.exchange.rateLimit / 1000) # Optional: uncomment if hitting rate limits often
-
-            # Stop if the last fetch was not a full limit, indicating we reached the end of available data
-            if len(candles) < self.limit:
-                break
-        
         print(f"Finished downloading {len(all_candles)} candles for {self.timeframe}.")
 
         df = pd.DataFrame(
@@ -69,15 +86,87 @@ class MarketDataDownloader:
         df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
         df.set_index("timestamp", inplace=True)
 
-        df = df[~df.index.duplicated(keep="first")]
-        df.sort_index(inplace=True)
+        if not df.index.is_monotonic_increasing:
+            df.sort_index(inplace=True, kind="mergesort")
+        df = drop_duplicate_timestamps(df)
+
+        if cached is not None:
+            df = pd.concat([cached, df])
+            # The refetched tail candle overlaps the cache; keep the fresh copy
+            if not (df.index.is_monotonic_increasing and df.index.is_unique):
+                df = df[~df.index.duplicated(keep="last")].sort_index(kind="mergesort")
+
+        if self.cache_path:
+            self.save_to_parquet(df, self.cache_path)
 
         return df
 
+    async def _fetch_pages(
+        self,
+        max_concurrency: int = 4,
+        requests_per_second: int = 20,
+        weight_cap: int = 1200,
+    ) -> list:
+        """
+        Download every page concurrently (bounded by a semaphore) and return
+        the candles in chronological page order.
+
+        Requests are paced by a token bucket rather than ccxt's fixed
+        per-call delay. When the exchange reports its used request weight
+        (Binance X-MBX-USED-WEIGHT-1M) near `weight_cap`, all pages wait
+        for the next minute window.
+        """
+        exchange = getattr(ccxt_async, self.exchange_name)({
+            "enableRateLimit": False,
+        })
+        sem = asyncio.Semaphore(max_concurrency)
+        limiter = TokenBucket(requests_per_second)
+        resume_at = 0.0
+
+        async def fetch_page(since):
+            nonlocal resume_at
+            async with sem:
+                delay = resume_at - time.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                async with limiter:
+                    candles = await exchange.fetch_ohlcv(
+                        symbol=self.symbol,
+                        timeframe=self.timeframe,
+                        since=since,
+                        limit=self.limit,
+                    )
+                headers = {k.lower(): v for k, v in (exchange.last_response_headers or {}).items()}
+                used_weight = int(headers.get("x-mbx-used-weight-1m") or 0)
+                if used_weight >= 0.9 * weight_cap:
+                    # Weight resets at the top of each minute
+                    resume_at = max(resume_at, time.time() - time.time() % 60 + 60)
+                return candles
+
+        try:
+            # Without a start date only the most recent page is available
+            if self.since is None:
+                return await fetch_page(None)
+
+            # Page cursors are known up front: each page covers `limit` candles
+            step_ms = exchange.parse_timeframe(self.timeframe) * 1000 * self.limit
+            cursors = range(self.since, exchange.milliseconds(), step_ms)
+            pages = await asyncio.gather(*(fetch_page(since) for since in cursors))
+        finally:
+            await exchange.close()
+
+        return [candle for page in pages for candle in page]
+
     def save_to_csv(self, df: pd.DataFrame, path: str):
         # Ensure the directory exists before saving
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        df.to_csv(path)
+        write_csv(df, path)
+        print(f"Saved {len(df)} rows to {path}")
+
+    def save_to_parquet(self, df: pd.DataFrame, path: str):
+        # Ensure the directory exists before saving
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_parquet(df, path)
         print(f"Saved {len(df)} rows to {path}")
 
 
@@ -93,9 +182,9 @@ if __name__ == "__main__":
         symbol=SYMBOL,
         timeframe="4h",
         since=SINCE_DATE,
+        cache_path="data/btc_usdt_4h.parquet",
     )
     df_4h = downloader_4h.fetch_ohlcv()
-    downloader_4h.save_to_csv(df_4h, "data/btc_usdt_4h.csv")
 
     print("-" * 30) # Separator for clarity
 
@@ -105,6 +194,6 @@ if __name__ == "__main__":
         symbol=SYMBOL,
         timeframe="1d",
         since=SINCE_DATE,
+        cache_path="data/btc_usdt_1d.parquet",
     )
     df_1d = downloader_1d.fetch_ohlcv()
-    downloader_1d.save_to_csv(df_1d, "data/btc_usdt_1d.csv")
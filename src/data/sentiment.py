@@ -1,10 +1,20 @@
+import email.utils
+import gzip
+import json
+import os
+
 import requests
 import pandas as pd
 
+from src.data.storage import write_csv
+
 
 class FearGreedIndex:
-    def __init__(self):
+    def __init__(self, cache_dir: str = "data/.cache"):
         self.url = "https://api.alternative.me/fng/"
+        self.cache_dir = cache_dir
+        self.session = requests.Session()
+        self.session.headers.update({"Accept-Encoding": "gzip"})
 
     def fetch(self, limit: int = 0) -> pd.DataFrame:
         """
@@ -13,18 +23,44 @@ class FearGreedIndex:
         limit=0 -> full history
         """
         params = {"limit": limit, "format": "json"}
-        response = requests.get(self.url, params=params, timeout=10)
-        response.raise_for_status()
+        cache_path = os.path.join(self.cache_dir, f"fng_{limit}.json.gz")
+
+        # Conditional GET: an unchanged index answers 304 with no body
+        headers = {}
+        if os.path.exists(cache_path):
+            headers["If-Modified-Since"] = email.utils.formatdate(
+                os.path.getmtime(cache_path), usegmt=True
+            )
 
-        data = response.json()["data"]
+        response = self.session.get(self.url, params=params, headers=headers, timeout=10)
+        if response.status_code == 304:
+            with gzip.open(cache_path, "rb") as f:
+                data = json.loads(f.read())["data"]
+        else:
+            response.raise_for_status()
+            data = response.json()["data"]
+            self._write_cache(cache_path, response.content)
 
-        df = pd.DataFrame(data)
-        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s", utc=True)
+        df = pd.DataFrame.from_records(
+            data, columns=["value", "value_classification", "timestamp", "time_until_update"]
+        )
+        df["timestamp"] = pd.to_datetime(df["timestamp"].astype("int64"), unit="s", utc=True)
         df.set_index("timestamp", inplace=True)
 
         df["value"] = df["value"].astype(float)
 
-        return df.sort_index()
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        return df
+
+    @staticmethod
+    def _write_cache(path: str, body: bytes):
+        """Gzip the raw response body to the cache (temp file + rename)."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
 
     @staticmethod
     def normalize(df: pd.DataFrame) -> pd.DataFrame:
@@ -36,7 +72,7 @@ class FearGreedIndex:
         return df
 
     def save_to_csv(self, df: pd.DataFrame, path: str):
-        df.to_csv(path)
+        write_csv(df, path)
         print(f"Saved sentiment data to {path}")
 
 if __name__ == "__main__":
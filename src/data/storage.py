@@ -0,0 +1,25 @@
+import os
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pacsv
+
+
+def write_csv(df: pd.DataFrame, path: str):
+    """
+    Write a dataframe (index as first column) with Arrow's C++ CSV writer.
+    Output stays readable with pd.read_csv(path, index_col=0, parse_dates=True).
+    """
+    table = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+    pacsv.write_csv(table, path, write_options=pacsv.WriteOptions(include_header=True))
+
+
+def write_parquet(df: pd.DataFrame, path: str):
+    """
+    Write a dataframe to zstd-compressed Parquet. Index and dtypes round-trip
+    exactly, so pd.read_parquet(path) needs no date parsing or coercion.
+    Written to a temp file and swapped in, so an interrupted run never leaves
+    a truncated file behind.
+    """
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, engine="pyarrow", compression="zstd")
+    os.replace(tmp_path, path)
@@ -1,6 +1,9 @@
+import numpy as np
 import pandas as pd
 import os # Import os to ensure the directory exists
 
+from src.data.storage import write_parquet
+
 
 def align_higher_timeframe(
     lower_df: pd.DataFrame,
@@ -8,32 +11,43 @@ def align_higher_timeframe(
     higher_tf_prefix: str = "D",
 ) -> pd.DataFrame:
     # ... (function body is the same as before) ...
-    # Ensure indices are datetime and sorted
-    lower_df = lower_df.copy().sort_index()
-    higher_df = higher_df.copy().sort_index()
-
-    # Shift higher timeframe by 1 period to avoid lookahead
-    higher_df_shifted = higher_df.shift(1)
-
-    # Rename columns to avoid collision
-    higher_df_shifted = higher_df_shifted.add_prefix(f"{higher_tf_prefix}_")
-
-    # Merge using backward fill (last known higher TF candle)
-    aligned_df = pd.merge_asof(
-        lower_df,
-        higher_df_shifted,
-        left_index=True,
-        right_index=True,
-        direction="backward",
+    # Ensure indices are sorted (already-sorted inputs are used as-is, no copy)
+    if not lower_df.index.is_monotonic_increasing:
+        lower_df = lower_df.sort_index()
+    if not higher_df.index.is_monotonic_increasing:
+        higher_df = higher_df.sort_index()
+
+    # Backward alignment (last known higher TF candle): one binary search per
+    # lower TF timestamp instead of a general merge_asof
+    pos = higher_df.index.searchsorted(lower_df.index, side="right") - 1
+
+    # Shift higher timeframe by 1 period to avoid lookahead: take the candle
+    # before the matched one straight from the raw array (no shifted frame)
+    src = pos - 1
+    higher_vals = higher_df.to_numpy(dtype="float64")
+    if len(higher_vals):
+        aligned_vals = higher_vals[np.maximum(src, 0)]
+        # Nothing to align to before the second higher TF candle
+        aligned_vals[src < 0] = np.nan
+    else:
+        aligned_vals = np.full((len(lower_df), higher_vals.shape[1]), np.nan)
+
+    # Prefix column names to avoid collision
+    aligned_cols = pd.DataFrame(
+        aligned_vals,
+        index=lower_df.index,
+        columns=[f"{higher_tf_prefix}_{c}" for c in higher_df.columns],
     )
 
+    aligned_df = pd.concat([lower_df, aligned_cols], axis=1)
+
     return aligned_df
 
 
 if __name__ == "__main__":
     # Load data
-    df_4h = pd.read_csv("data/btc_usdt_4h.csv", index_col=0, parse_dates=True)
-    df_1d = pd.read_csv("data/btc_usdt_1d.csv", index_col=0, parse_dates=True)
+    df_4h = pd.read_parquet("data/btc_usdt_4h.parquet")
+    df_1d = pd.read_parquet("data/btc_usdt_1d.parquet")
 
     aligned = align_higher_timeframe(df_4h, df_1d)
 
@@ -41,7 +55,7 @@ if __name__ == "__main__":
     print(aligned.columns)
 
     # --- ADDED CODE TO SAVE THE FILE ---
-    output_path = "data/btc_usdt_aligned_4h_1d.csv"
+    output_path = "data/btc_usdt_aligned_4h_1d.parquet"
     os.makedirs(os.path.dirname(output_path), exist_ok=True) # Ensure the directory exists
-    aligned.to_csv(output_path)
+    write_parquet(aligned, output_path)
     print(f"\nSuccessfully saved the aligned data to {output_path}")
@@ -1,11 +1,11 @@
+import numpy as np
 import pandas as pd
 from enum import Enum
 from datetime import datetime
 
-from src.regime.regime_detector import MarketRegime
-from src.strategies.trend_following_refined import TrendSignal
-from src.strategies.mean_reversion_refined import MeanReversionSignal
-from src.strategies.bollinger import BollingerSignal
+from src.data.storage import write_parquet
+from src.regime.regime_detector import MarketRegime, regime_mask
+from src.strategies.signal_kernels import SIGNAL_FLAT, SIGNAL_LONG, signal_codes, signal_labels
 
 
 class TradeIntent(Enum):
@@ -43,60 +43,64 @@ class StrategyRouter:
         Decide final trade intent based on regime and sentiment.
         """
 
-        result = pd.DataFrame(index=df.index)
-        result["intent"] = TradeIntent.FLAT.value
-        result["stop_price"] = None
-        result["source"] = None
-        result["risk_per_trade"] = 0.0
-
-        for i in df.index:
-            regime = df.loc[i, "regime"]
-            sentiment = df.loc[i, "sentiment_norm"]
-
-            chosen_source = None
-            chosen_stop = None
-
-            # --- TREND REGIME ---
-            if regime == MarketRegime.TREND.value:
-                if sentiment is not None and sentiment <= 0.5:
-                    continue  # Block TREND in Neutral, Fear, Extreme Fear
-                if trend_signals.loc[i, "signal"] == TrendSignal.LONG.value:
-                    chosen_source = "TREND"
-                    chosen_stop = trend_signals.loc[i, "stop_price"]
-
-            # --- RANGE REGIME ---
-            elif regime == MarketRegime.RANGE.value:
-                if sentiment is not None and sentiment <= self.neutral_block:
-                    continue  # Block RANGE in Neutral and Extreme Fear
-
-                # Collect possible signals
-                candidates = []
-                if mr_signals.loc[i, "signal"] == MeanReversionSignal.LONG.value:
-                    candidates.append(("MEAN_REVERSION", mr_signals.loc[i, "stop_price"]))
-                if boll_signals.loc[i, "signal"] == BollingerSignal.LONG.value:
-                    candidates.append(("BOLLINGER", boll_signals.loc[i, "stop_price"]))
-
-                if candidates:
-                    # Resolve conflicts by priority
-                    candidates.sort(key=lambda x: self.priority[x[0]], reverse=True)
-                    chosen_source, chosen_stop = candidates[0]
-
-            # --- Apply chosen signal ---
-            if chosen_source:
-                result.loc[i, "intent"] = TradeIntent.LONG.value
-                result.loc[i, "stop_price"] = chosen_stop
-                result.loc[i, "source"] = chosen_source
-                result.loc[i, "risk_per_trade"] = self.risk_per_trade[chosen_source]
-
-        return result
+        n = len(df.index)
+        is_trend = regime_mask(df["regime"], MarketRegime.TREND)
+        is_range = regime_mask(df["regime"], MarketRegime.RANGE)
+        sentiment = df["sentiment_norm"].to_numpy(dtype="float64")
+
+        trend_sig = signal_codes(trend_signals["signal"])
+        trend_stop = trend_signals["stop_price"].to_numpy(dtype="float64")
+        mr_sig = signal_codes(mr_signals["signal"])
+        mr_stop = mr_signals["stop_price"].to_numpy(dtype="float64")
+        boll_sig = signal_codes(boll_signals["signal"])
+        boll_stop = boll_signals["stop_price"].to_numpy(dtype="float64")
+
+        # --- TREND REGIME: blocked in Neutral, Fear, Extreme Fear ---
+        m_trend = (
+            is_trend
+            & ~(sentiment <= 0.5)
+            & (trend_sig == SIGNAL_LONG)
+        )
+
+        # --- RANGE REGIME: blocked in Neutral and Extreme Fear ---
+        range_ok = is_range & ~(sentiment <= self.neutral_block)
+        m_mr = range_ok & (mr_sig == SIGNAL_LONG)
+        m_boll = range_ok & (boll_sig == SIGNAL_LONG)
+
+        # Resolve conflicts by priority (highest wins)
+        candidates = [
+            ("TREND", m_trend, trend_stop),
+            ("MEAN_REVERSION", m_mr, mr_stop),
+            ("BOLLINGER", m_boll, boll_stop),
+        ]
+        candidates.sort(key=lambda c: self.priority[c[0]])
+
+        intent = np.full(n, SIGNAL_FLAT, dtype=np.int8)
+        stop_price = np.full(n, np.nan, dtype="float64")
+        source = np.full(n, None, dtype=object)
+        risk_per_trade = np.zeros(n, dtype="float64")
+
+        # --- Apply chosen signal (lowest priority first, so higher overwrites) ---
+        for name, mask, stops in candidates:
+            intent[mask] = SIGNAL_LONG
+            stop_price[mask] = stops[mask]
+            source[mask] = name
+            risk_per_trade[mask] = self.risk_per_trade[name]
+
+        return pd.DataFrame(
+            {
+                "intent": signal_labels(intent),
+                "stop_price": stop_price,
+                "source": source,
+                "risk_per_trade": risk_per_trade,
+            },
+            index=df.index,
+        )
 
 
 if __name__ == "__main__":
-    df = pd.read_csv(
-        "data/btc_usdt_features.csv",
-        index_col=0,
-        parse_dates=True,
-    )
+    # Full frame: the backtester below reads columns beyond the strategies' inputs
+    df = pd.read_parquet("data/btc_usdt_features.parquet")
 
     from src.strategies.trend_following_refined import TrendFollowingStrategy
     from src.strategies.mean_reversion_refined import MeanReversionStrategy
@@ -116,8 +120,8 @@ if __name__ == "__main__":
 
     # --- Save final routed intents for backtester ---
     timestamp = datetime.now().strftime("%Y-%m-%d")
-    filename = f"data/final_intent_{timestamp}.csv"
-    routed.to_csv(filename)
+    filename = f"data/final_intent_{timestamp}.parquet"
+    write_parquet(routed, filename)
     print(f"\nSaved final intents to {filename}")
 
     print(routed.tail(20))
@@ -1,9 +1,12 @@
+import numpy as np
 import pandas as pd
 from enum import Enum
 from datetime import datetime
 
-from src.regime.regime_detector import MarketRegime
-from src.strategies.trend_following_refined import TrendSignal
+from src.data.storage import write_parquet
+from src.features.technical import ema_array, rolling_mean_array
+from src.regime.regime_detector import MarketRegime, regime_mask
+from src.strategies.signal_kernels import SIGNAL_FLAT, SIGNAL_LONG, signal_codes, signal_labels
 
 
 class TradeIntent(Enum):
@@ -25,77 +28,78 @@ class StrategyRouter:
         boll_signals: pd.DataFrame = None,
     ) -> pd.DataFrame:
 
-        result = pd.DataFrame(index=df.index)
-        result["intent"] = TradeIntent.FLAT.value
-        result["stop_price"] = None
-        result["source"] = None
-        result["risk_per_trade"] = 0.0
+        # --- Materialize columns once ---
+        close_arr = df["close"].to_numpy(dtype="float64")
+        vol_arr = df["volume"].to_numpy(dtype="float64")
+        atr_arr = df["atr_4h"].to_numpy(dtype="float64") if "atr_4h" in df.columns else None
+        is_trend = regime_mask(df["regime"], MarketRegime.TREND)
+        sent_arr = df["sentiment_norm"].to_numpy(dtype="float64")
 
         # --- Precompute indicators (cheap + deterministic) ---
-        vol_ma20 = df["volume"].rolling(20).mean()
-        price_ma50 = df["close"].rolling(50).mean()
-
-        ema_fast = df["close"].ewm(span=20, adjust=False).mean()
-        ema_slow = df["close"].ewm(span=50, adjust=False).mean()
-
-        atr_ma20 = (
-            df["atr_4h"].rolling(20).mean()
-            if "atr_4h" in df.columns
-            else None
+        # volume and ATR share the 20-bar window: one fused rolling pass
+        if atr_arr is not None:
+            ma20 = rolling_mean_array(np.column_stack((vol_arr, atr_arr)), 20)
+            vol_ma20_arr, atr_ma20_arr = ma20[:, 0], ma20[:, 1]
+        else:
+            vol_ma20_arr, atr_ma20_arr = rolling_mean_array(vol_arr, 20), None
+        price_ma50_arr = rolling_mean_array(close_arr, 50)
+
+        ema_fast_arr = ema_array(close_arr, 20)
+        ema_slow_arr = ema_array(close_arr, 50)
+
+        trend_sig_arr = signal_codes(trend_signals["signal"])
+        trend_stop_arr = trend_signals["stop_price"].to_numpy(dtype="float64")
+
+        # ====================================================
+        # TREND STRATEGY (EXPECTANCY-OPTIMIZED)
+        # ====================================================
+        with np.errstate(divide="ignore", invalid="ignore"):
+            trend_strength = (ema_fast_arr - ema_slow_arr) / ema_slow_arr
+
+        gate = (
+            is_trend
+            # --- Sentiment gate: GREED only ---
+            & (sent_arr >= 0.35) & (sent_arr < 0.65)
+            # --- Signal gate ---
+            & (trend_sig_arr == SIGNAL_LONG)
+            # --- Breakout quality (kill low-quality trades completely) ---
+            & (vol_arr > vol_ma20_arr * 1.2)
+            & (close_arr >= price_ma50_arr)
+            # --- Trend strength (EMA separation, ~0.2%; NaN during warm-up fails) ---
+            & (trend_strength >= 0.002)
         )
 
-        for i in df.index:
-            regime = df.loc[i, "regime"]
-            sentiment = df.loc[i, "sentiment_norm"]
-
-            # ====================================================
-            # TREND STRATEGY (EXPECTANCY-OPTIMIZED)
-            # ====================================================
-            if regime == MarketRegime.TREND.value:
-
-                # --- Sentiment gate: GREED only ---
-                if sentiment is None or not (0.35 <= sentiment < 0.65):
-                    continue
-
-                # --- Signal gate ---
-                if trend_signals.loc[i, "signal"] != TrendSignal.LONG.value:
-                    continue
-
-                # --- Breakout quality ---
-                strict_pass = (
-                    df.loc[i, "volume"] > vol_ma20.loc[i] * 1.2
-                    and df.loc[i, "close"] >= price_ma50.loc[i]
-                )
-
-                if not strict_pass:
-                    continue  # ❌ kill low-quality trades completely
-
-                # --- Trend strength (EMA separation) ---
-                trend_strength = (ema_fast.loc[i] - ema_slow.loc[i]) / ema_slow.loc[i]
-                if trend_strength < 0.002:  # ~0.2% separation
-                    continue
-
-                # --- Volatility expansion ---
-                if atr_ma20 is not None:
-                    if df.loc[i, "atr_4h"] < atr_ma20.loc[i] * 1.1:
-                        continue
-
-                # --- Stop logic ---
-                stop_price = trend_signals.loc[i, "stop_price"]
-
-                if pd.isna(stop_price) or stop_price is None:
-                    if "atr_4h" in df.columns and not pd.isna(df.loc[i, "atr_4h"]):
-                        stop_price = df.loc[i, "close"] - 3 * df.loc[i, "atr_4h"]
-                    else:
-                        continue  # no valid stop → no trade
-
-                # --- FINAL ENTRY ---
-                result.loc[i, "intent"] = TradeIntent.LONG.value
-                result.loc[i, "stop_price"] = stop_price
-                result.loc[i, "source"] = "TREND"
-                result.loc[i, "risk_per_trade"] = self.trend_risk_strict
-
-        return result
+        # --- Volatility expansion ---
+        if atr_ma20_arr is not None:
+            gate &= ~(atr_arr < atr_ma20_arr * 1.1)
+
+        # --- Stop logic: fall back to 3x ATR, no valid stop → no trade ---
+        stop_final = trend_stop_arr
+        if atr_arr is not None:
+            stop_final = np.where(np.isnan(trend_stop_arr), close_arr - 3 * atr_arr, trend_stop_arr)
+        gate &= ~np.isnan(stop_final)
+
+        # --- FINAL ENTRY (typed outputs, allocated once) ---
+        n = len(df.index)
+        intent = np.full(n, SIGNAL_FLAT, dtype=np.int8)
+        stop = np.full(n, np.nan, dtype="float64")
+        source = np.full(n, None, dtype=object)
+        risk = np.zeros(n, dtype="float64")
+
+        intent[gate] = SIGNAL_LONG
+        stop[gate] = stop_final[gate]
+        source[gate] = "TREND"
+        risk[gate] = self.trend_risk_strict
+
+        return pd.DataFrame(
+            {
+                "intent": signal_labels(intent),
+                "stop_price": stop,
+                "source": source,
+                "risk_per_trade": risk,
+            },
+            index=df.index,
+        )
 
 
 # ============================================================
@@ -103,11 +107,8 @@ class StrategyRouter:
 # ============================================================
 if __name__ == "__main__":
 
-    df = pd.read_csv(
-        "data/btc_usdt_features.csv",
-        index_col=0,
-        parse_dates=True,
-    )
+    # Full frame: the backtester below reads columns beyond the strategies' inputs
+    df = pd.read_parquet("data/btc_usdt_features.parquet")
 
     from src.strategies.trend_following_refined import TrendFollowingStrategy
     from src.backtest.event_backtester_refined import EventBacktester
@@ -119,8 +120,8 @@ if __name__ == "__main__":
     routed = router.route(df, trend_signals)
 
     timestamp = datetime.now().strftime("%Y-%m-%d")
-    filename = f"data/final_intent_{timestamp}.csv"
-    routed.to_csv(filename)
+    filename = f"data/final_intent_{timestamp}.parquet"
+    write_parquet(routed, filename)
 
     print(f"\nSaved final intents to {filename}")
     print("\nFinal intent distribution:")
@@ -1,5 +1,6 @@
 import time
 import ccxt
+import numpy as np
 import pandas as pd
 
 from src.execution.exchange import Exchange
@@ -25,12 +26,19 @@ class LiveBroker(Exchange):
 
     def fetch_ohlcv(self, symbol: str, timeframe: str, limit: int = 200):
         data = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-        df = pd.DataFrame(
-            data,
-            columns=["timestamp", "open", "high", "low", "close", "volume"],
+        # One typed 2-D array, then split into columns (no per-row dtype inference)
+        arr = np.asarray(data, dtype=np.float64).reshape(-1, 6)
+        index = pd.to_datetime(arr[:, 0].astype("int64"), unit="ms").rename("timestamp")
+        return pd.DataFrame(
+            {
+                "open": arr[:, 1],
+                "high": arr[:, 2],
+                "low": arr[:, 3],
+                "close": arr[:, 4],
+                "volume": arr[:, 5],
+            },
+            index=index,
         )
-        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
-        return df.set_index("timestamp")
 
     def get_balance(self):
         balances = self.exchange.fetch_balance() 
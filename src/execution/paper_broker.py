@@ -1,52 +1,184 @@
+import time
+import numpy as np
 import pandas as pd
-from datetime import datetime
 from src.execution.exchange import Exchange
 from typing import Optional, Dict, List, Any
 from src.monitoring.alerts import AlertManager 
 from src.monitoring.logger import setup_logger
 from src.state.state_store import StateStore
 
+# Columns the bot loop reads from the features file. Explicit dtypes skip
+# per-column type inference; prices stay float64 so fills remain plain floats.
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume", "regime", "sentiment_norm", "atr_4h"]
+OHLCV_DTYPES = {
+    "open": "float64",
+    "high": "float64",
+    "low": "float64",
+    "close": "float64",
+    "volume": "float64",
+    "atr_4h": "float64",
+    "sentiment_norm": "float64",
+    "regime": "category",
+}
+
+
+class TradeBuffer:
+    """
+    Append-only, columnar trade log: parallel NumPy arrays that double in size
+    when full, instead of one dict per trade. String fields (symbol, side,
+    status, reason) are stored as int8 codes into a per-field label list;
+    None is code -1. Indexing a row gives back the original entry dict.
+    """
+
+    NUMERIC = {"time_ns": np.int64, "price": np.float64, "amount": np.float64, "balance": np.float64}
+    CODED = ("symbol", "side", "status", "reason")
+    FIELDS = ("time_ns", "symbol", "side", "price", "amount", "balance", "status", "reason")
+
+    def __init__(self, capacity: int = 1024):
+        self._n = 0
+        self._cols = {name: np.empty(capacity, dtype) for name, dtype in self.NUMERIC.items()}
+        self._cols.update({name: np.empty(capacity, np.int8) for name in self.CODED})
+        self._labels: Dict[str, List[str]] = {name: [] for name in self.CODED}
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in self.CODED}
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _code(self, name: str, label: Optional[str]) -> int:
+        if label is None:
+            return -1
+        code = self._codes[name].get(label)
+        if code is None:
+            code = len(self._labels[name])
+            if code > np.iinfo(np.int8).max:
+                raise ValueError(f"Too many distinct {name} values for the trade log")
+            self._codes[name][label] = code
+            self._labels[name].append(label)
+        return code
+
+    def append(self, entry: Dict[str, Any]):
+        if self._n == len(self._cols["time_ns"]):
+            for name, col in self._cols.items():
+                grown = np.empty(max(2 * len(col), 1), col.dtype)
+                grown[: self._n] = col[: self._n]
+                self._cols[name] = grown
+        i = self._n
+        time_ns = entry.get("time_ns")
+        if time_ns is None:
+            # Entries written before time_ns carry an ISO `time` string (UTC)
+            time_ns = pd.Timestamp(entry["time"]).value if entry.get("time") else 0
+        self._cols["time_ns"][i] = time_ns
+        for name in ("price", "amount", "balance"):
+            value = entry.get(name)
+            self._cols[name][i] = np.nan if value is None else value
+        for name in self.CODED:
+            self._cols[name][i] = self._code(name, entry.get(name))
+        self._n += 1
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("trade log index out of range")
+        row: Dict[str, Any] = {}
+        for name in self.FIELDS:
+            value = self._cols[name][i]
+            if name in self.CODED:
+                row[name] = self._labels[name][value] if value >= 0 else None
+            else:
+                row[name] = value.item()
+        return row
+
+    def __iter__(self):
+        return (self[i] for i in range(self._n))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Materialize the log; `time` is a UTC datetime column built from `time_ns`."""
+        n = self._n
+        data: Dict[str, Any] = {"time": pd.to_datetime(self._cols["time_ns"][:n], unit="ns", utc=True)}
+        for name in self.FIELDS:
+            col = self._cols[name][:n].copy()
+            if name in self.CODED:
+                data[name] = pd.Categorical.from_codes(col, categories=self._labels[name])
+            else:
+                data[name] = col
+        return pd.DataFrame(data)
+
 
 class PaperBroker(Exchange):
     def __init__(
         self,
         starting_balance: float = 100.0,
-        data_path: str = "data/btc_usdt_features.csv",
+        data_path: str = "data/btc_usdt_features.parquet",
         state_path: str = "state/paper_state.json",
+        trade_log_path: str = "state/trade_log.jsonl",
     ):
         self.balance = starting_balance
         self.positions: Dict[str, Dict[str, Any]] = {}
-        self.trade_log: List[Dict[str, Any]] = []
         self.data_path = data_path 
         # --- State persistence ---
-        self.state_store = StateStore(state_path, initial_equity=starting_balance)
+        self.state_store = StateStore(
+            state_path, initial_equity=starting_balance, trade_log_path=trade_log_path
+        )
         state = self.state_store.load()
         self.balance = state.get("equity", starting_balance) 
         self.positions: Dict[str, Dict[str, Any]] = state.get("positions", {})
-        self.trade_log: List[Dict[str, Any]] = state.get("trade_log", [])
+
+        # --- Trade log: append-only JSONL kept by the state store, one line per order ---
+        self.trade_log = TradeBuffer()
+        for entry in self.state_store.load_trade_log():
+            self.trade_log.append(entry)
         self.open_orders: Dict[str, Dict[str, Any]] = {}
         self.next_order_id = len(self.trade_log) + 1
 
-        # preload OHLCV data
-        self.ohlcv_data = pd.read_csv(self.data_path, parse_dates=["timestamp"])
-        self.ohlcv_data.set_index("timestamp", inplace=True)
+        # preload OHLCV data (Parquet keeps dtypes and the timestamp index; CSV as fallback)
+        if self.data_path.endswith(".parquet"):
+            self.ohlcv_data = pd.read_parquet(self.data_path, columns=OHLCV_COLUMNS)
+        else:
+            self.ohlcv_data = pd.read_csv(
+                self.data_path,
+                engine="c",
+                usecols=["timestamp"] + OHLCV_COLUMNS,
+                dtype=OHLCV_DTYPES,
+                parse_dates=["timestamp"],
+                index_col="timestamp",
+            )
+        # Market fills read the close at the simulation clock (latest bar)
+        self._close_arr = self.ohlcv_data["close"].to_numpy()
+        # Read-only (n, 5) OHLCV block for array consumers (fetch_ohlcv_np)
+        self._np_view = self.ohlcv_data[["open", "high", "low", "close", "volume"]].to_numpy(np.float64)
+        self._np_view.flags.writeable = False
+        self._clock_idx = len(self._close_arr) - 1
 
         # Monitoring 
         self.logger = setup_logger("PaperBroker", "paper_broker.log") 
         self.alerts = AlertManager(self.logger)
 
     def _persist_state(self): 
-        """Save current broker state to JSON file.""" 
+        """Save equity/positions snapshot to JSON file (trade log is appended separately).""" 
         state = { 
             "equity": self.balance, 
             "positions": self.positions, 
-            "trade_log": self.trade_log, 
             } 
         self.state_store.save(state)
 
-    def fetch_ohlcv(self, symbol: str, timeframe: str, limit: int = 200) -> pd.DataFrame:
+    def _append_trade(self, entry: Dict[str, Any]):
+        self.trade_log.append(entry)
+        self.state_store.append_trade(entry)
+
+    def trade_log_frame(self) -> pd.DataFrame:
+        """Trade log as a DataFrame with a UTC `time` column built from `time_ns`."""
+        return self.trade_log.to_dataframe()
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str, limit: int = 200, copy: bool = False) -> pd.DataFrame:
         #raise ConnectionError("Simulated exchange failure")
-        return self.ohlcv_data.tail(limit).copy()
+        # Copy-on-write (pandas >= 3): the slice shares memory until a caller writes to it
+        window = self.ohlcv_data.tail(limit)
+        return window.copy() if copy else window
+
+    def fetch_ohlcv_np(self, limit: int = 200) -> np.ndarray:
+        """Last `limit` bars as a read-only (limit, 5) open/high/low/close/volume view."""
+        return self._np_view[len(self._np_view) - limit:]
 
     def get_balance(self) -> Dict[str, float]:
         return {"USDT": self.balance}
@@ -66,7 +198,7 @@ class PaperBroker(Exchange):
 
         # Determine fill price
         if order_type == "market":
-            fill_price = self.ohlcv_data["close"].iloc[-1]
+            fill_price = float(self._close_arr[self._clock_idx])
         else:
             fill_price = price
 
@@ -80,7 +212,7 @@ class PaperBroker(Exchange):
             "amount": amount,
             "price": fill_price,
             "status": "open" if order_type == "limit" else "filled",
-            "time": datetime.utcnow(),
+            "time_ns": time.time_ns(),  # epoch ns; formatted on read (trade_log_frame)
         }
 
         if order_type == "market":
@@ -114,8 +246,8 @@ class PaperBroker(Exchange):
             # Limit order stays open until cancelled or matched
             self.open_orders[order_id] = order
 
-        self.trade_log.append({
-            "time": order["time"],
+        self._append_trade({
+            "time_ns": order["time_ns"],
             "symbol": symbol,
             "side": side,
             "price": fill_price,
@@ -125,7 +257,7 @@ class PaperBroker(Exchange):
             "reason": reason,
         })
 
-        # --- Persist state after every trade --- 
+        # --- Persist snapshot after every trade (O(1): no trade log inside) --- 
         self._persist_state()
 
         return order
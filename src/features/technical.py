@@ -1,57 +1,306 @@
 import pandas as pd
 import numpy as np
+from numba import njit
+
+from src.data.storage import write_parquet
 
 # ... (keep your sma, ema, rsi, bollinger_bands, and atr functions the same) ...
 
+def float_array(x) -> np.ndarray:
+    """
+    C-contiguous float64 view of a Series/array (copies only when needed).
+    A column of a frame built from a 2-D row-major array is strided; the numba
+    kernels below would silently take the slower strided path on it.
+    """
+    return np.ascontiguousarray(np.asarray(x, dtype=np.float64))
+
 def sma(series: pd.Series, window: int) -> pd.Series:
-    return series.rolling(window=window, min_periods=window).mean()
+    return pd.Series(_rolling_mean_nb(float_array(series), window), index=series.index)
 
 def ema(series: pd.Series, window: int) -> pd.Series:
     return series.ewm(span=window, adjust=False).mean()
 
+# --- Numba kernels (float64 arrays in, float64 arrays out) ---
+# Windows are short (<= 50 bars), so each one is summed directly rather than
+# with running sums: no drift against pandas, and NaN semantics match
+# rolling(min_periods=window) exactly (any NaN in the window -> NaN).
+
+@njit(cache=True)
+def _rolling_mean_nb(x: np.ndarray, window: int) -> np.ndarray:
+    n = len(x)
+    out = np.full(n, np.nan)
+    for i in range(window - 1, n):
+        total = 0.0
+        for j in range(i - window + 1, i + 1):
+            total += x[j]
+        out[i] = total / window  # NaN propagates through the sum
+    return out
+
+@njit(cache=True)
+def _rolling_mean_pair_nb(x: np.ndarray, w_fast: int, w_slow: int):
+    # One walk over x with a running sum per window: each bar adds x[i] and
+    # subtracts the value leaving that window. NaNs are counted instead of
+    # summed, and any NaN in a window gives NaN (as rolling(min_periods=window)).
+    # Running sums can differ from the direct sums above in the last bits.
+    n = len(x)
+    fast = np.full(n, np.nan)
+    slow = np.full(n, np.nan)
+    sum_fast = 0.0
+    sum_slow = 0.0
+    nan_fast = 0
+    nan_slow = 0
+    for i in range(n):
+        v = x[i]
+        if np.isnan(v):
+            nan_fast += 1
+            nan_slow += 1
+        else:
+            sum_fast += v
+            sum_slow += v
+        if i >= w_fast:
+            old = x[i - w_fast]
+            if np.isnan(old):
+                nan_fast -= 1
+            else:
+                sum_fast -= old
+        if i >= w_slow:
+            old = x[i - w_slow]
+            if np.isnan(old):
+                nan_slow -= 1
+            else:
+                sum_slow -= old
+        if i >= w_fast - 1 and nan_fast == 0:
+            fast[i] = sum_fast / w_fast
+        if i >= w_slow - 1 and nan_slow == 0:
+            slow[i] = sum_slow / w_slow
+    return fast, slow
+
+@njit(cache=True)
+def _rolling_std_nb(x: np.ndarray, window: int) -> np.ndarray:
+    # Sample std (ddof=1), two-pass per window for stability
+    n = len(x)
+    out = np.full(n, np.nan)
+    if window < 2:
+        return out
+    for i in range(window - 1, n):
+        total = 0.0
+        for j in range(i - window + 1, i + 1):
+            total += x[j]
+        mean = total / window
+        sq = 0.0
+        for j in range(i - window + 1, i + 1):
+            sq += (x[j] - mean) ** 2
+        out[i] = np.sqrt(sq / (window - 1))
+    return out
+
+@njit(cache=True)
+def _true_range_nb(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    # Row-wise max of the three ranges, skipping NaN legs (first bar: high - low)
+    n = len(close)
+    out = np.empty(n)
+    for i in range(n):
+        tr = high[i] - low[i]
+        if i > 0:
+            up = abs(high[i] - close[i - 1])
+            down = abs(low[i] - close[i - 1])
+            if np.isnan(tr) or up > tr:
+                tr = up
+            if np.isnan(tr) or down > tr:
+                tr = down
+        out[i] = tr
+    return out
+
+@njit(cache=True)
+def _rsi_nb(close: np.ndarray, window: int):
+    # Average gain / loss over the window; missing deltas count as 0
+    n = len(close)
+    gain = np.zeros(n)
+    loss = np.zeros(n)
+    for i in range(1, n):
+        delta = close[i] - close[i - 1]
+        if delta > 0:
+            gain[i] = delta
+        elif delta < 0:
+            loss[i] = -delta
+    return _rolling_mean_nb(gain, window), _rolling_mean_nb(loss, window)
+
+@njit(cache=True)
+def compute_indicators(high, low, close, w_sma_fast, w_sma_slow, w_rsi, w_atr, w_bb, num_std):
+    """
+    SMA(fast), SMA(slow), RSI, ATR and Bollinger Bands in one pass over the bars.
+    Each bar updates its true range and gain/loss, then every trailing window is
+    summed while that stretch of the arrays is still in cache. Summation order is
+    the same as the single-indicator kernels, so results match them exactly.
+    Returns (sma_fast, sma_slow, rsi, atr, bb_mid, bb_upper, bb_lower).
+    """
+    n = len(close)
+    sma_fast = np.full(n, np.nan)
+    sma_slow = np.full(n, np.nan)
+    rsi_out = np.full(n, np.nan)
+    atr_out = np.full(n, np.nan)
+    bb_mid = np.full(n, np.nan)
+    bb_upper = np.full(n, np.nan)
+    bb_lower = np.full(n, np.nan)
+    tr = np.empty(n)
+    gain = np.zeros(n)
+    loss = np.zeros(n)
+
+    for i in range(n):
+        # --- Per-bar inputs: true range and gain/loss (see _true_range_nb/_rsi_nb) ---
+        t = high[i] - low[i]
+        if i > 0:
+            up = abs(high[i] - close[i - 1])
+            down = abs(low[i] - close[i - 1])
+            if np.isnan(t) or up > t:
+                t = up
+            if np.isnan(t) or down > t:
+                t = down
+            delta = close[i] - close[i - 1]
+            if delta > 0:
+                gain[i] = delta
+            elif delta < 0:
+                loss[i] = -delta
+        tr[i] = t
+
+        # --- Trailing windows ending at bar i ---
+        if i >= w_sma_fast - 1:
+            total = 0.0
+            for j in range(i - w_sma_fast + 1, i + 1):
+                total += close[j]
+            sma_fast[i] = total / w_sma_fast
+        if i >= w_sma_slow - 1:
+            total = 0.0
+            for j in range(i - w_sma_slow + 1, i + 1):
+                total += close[j]
+            sma_slow[i] = total / w_sma_slow
+        if i >= w_rsi - 1:
+            g = 0.0
+            l = 0.0
+            for j in range(i - w_rsi + 1, i + 1):
+                g += gain[j]
+                l += loss[j]
+            rs = (g / w_rsi) / (l / w_rsi) if l != 0.0 else (np.inf if g > 0.0 else np.nan)
+            rsi_out[i] = 100 - (100 / (1 + rs))
+        if i >= w_atr - 1:
+            total = 0.0
+            for j in range(i - w_atr + 1, i + 1):
+                total += tr[j]
+            atr_out[i] = total / w_atr
+        if i >= w_bb - 1:
+            total = 0.0
+            for j in range(i - w_bb + 1, i + 1):
+                total += close[j]
+            mean = total / w_bb
+            bb_mid[i] = mean
+            if w_bb >= 2:
+                sq = 0.0
+                for j in range(i - w_bb + 1, i + 1):
+                    sq += (close[j] - mean) ** 2
+                std = np.sqrt(sq / (w_bb - 1))
+                bb_upper[i] = mean + num_std * std
+                bb_lower[i] = mean - num_std * std
+
+    return sma_fast, sma_slow, rsi_out, atr_out, bb_mid, bb_upper, bb_lower
+
+# --- Array kernels (no index alignment, for hot paths) ---
+
+def rolling_mean_array(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing mean of a 1-D or (n, k) float array; NaN until the window is full
+    (same as sma).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if x.ndim == 1:
+        return _rolling_mean_nb(np.ascontiguousarray(x), window)
+    return np.column_stack([_rolling_mean_nb(np.ascontiguousarray(col), window) for col in x.T])
+
+def sma_dual_array(x: np.ndarray, w_fast: int, w_slow: int):
+    """
+    Fast and slow trailing means of a 1-D array in one pass with running sums
+    (rolling_mean_array per window, up to float rounding). Returns (fast, slow).
+    """
+    return _rolling_mean_pair_nb(float_array(x), w_fast, w_slow)
+
+@njit(cache=True)
+def ema_array(x: np.ndarray, span: int) -> np.ndarray:
+    """
+    EMA recurrence (same as ema, adjust=False) for NaN-free input.
+    """
+    alpha = 2.0 / (span + 1.0)
+    out = np.empty_like(x)
+    if len(x) == 0:
+        return out
+    out[0] = x[0]
+    for i in range(1, len(x)):
+        out[i] = alpha * x[i] + (1.0 - alpha) * out[i - 1]
+    return out
+
+
+def true_range_array(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """
+    Per-bar true range (the series atr averages) from float arrays.
+    """
+    return _true_range_nb(float_array(high), float_array(low), float_array(close))
+
 def rsi(series: pd.Series, window: int = 14) -> pd.Series:
-    delta = series.diff()
-    gain = delta.where(delta > 0, 0.0)
-    loss = -delta.where(delta < 0, 0.0)
-    avg_gain = gain.rolling(window=window, min_periods=window).mean()
-    avg_loss = loss.rolling(window=window, min_periods=window).mean()
-    rs = avg_gain / avg_loss
-    return 100 - (100 / (1 + rs))
+    avg_gain, avg_loss = _rsi_nb(float_array(series), window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+    return pd.Series(100 - (100 / (1 + rs)), index=series.index)
 
 def bollinger_bands(series: pd.Series, window: int = 20, num_std: float = 2.0):
-    ma = sma(series, window)
-    std = series.rolling(window=window, min_periods=window).std()
-    return ma, ma + num_std * std, ma - num_std * std
+    arr = float_array(series)
+    ma = _rolling_mean_nb(arr, window)
+    std = _rolling_std_nb(arr, window)
+    return (
+        pd.Series(ma, index=series.index),
+        pd.Series(ma + num_std * std, index=series.index),
+        pd.Series(ma - num_std * std, index=series.index),
+    )
+
+def atr_array(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = 14) -> np.ndarray:
+    """
+    ATR (trailing mean of the true range, same as atr) straight from arrays,
+    for callers that already hold them.
+    """
+    return _rolling_mean_nb(true_range_array(high, low, close), window)
 
 def atr(df: pd.DataFrame, window: int = 14) -> pd.Series:
-    high, low, close = df["high"], df["low"], df["close"]
-    tr1 = high - low
-    tr2 = (high - close.shift()).abs()
-    tr3 = (low - close.shift()).abs()
-    true_range = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    return true_range.rolling(window=window, min_periods=window).mean()
+    return pd.Series(atr_array(df["high"], df["low"], df["close"], window), index=df.index)
+
+# Column names for precomputed indicators, keyed by their parameters so a
+# strategy only reuses a column built with the windows it would use itself
+def rsi_column(window: int) -> str:
+    return f"rsi_{window}"
+
+def bollinger_columns(window: int, num_std: float) -> tuple[str, str, str]:
+    suffix = f"{window}_{num_std:g}"
+    return f"bb_mid_{suffix}", f"bb_upper_{suffix}", f"bb_lower_{suffix}"
+
+def atr_column(window: int) -> str:
+    return f"atr_{window}"
 
 if __name__ == "__main__":
     # 1. Load the ALIGNED file (Cleaned 4h + Cleaned 1D shifted)
     # This file ensures no lookahead bias for the Daily indicators
-    df = pd.read_csv("data/btc_usdt_aligned_4h_1d.csv", index_col=0, parse_dates=True)
+    df = pd.read_parquet("data/btc_usdt_aligned_4h_1d.parquet")
 
     # --- 2. 4h INDICATORS (Execution/Timing) ---
-    df["sma_20_4h"] = sma(df["close"], 20)
-    df["sma_50_4h"] = sma(df["close"], 50)
-    df["rsi_4h"] = rsi(df["close"], 14)
-    df["atr_4h"] = atr(df, 14)
-    
-    # Bollinger Bands on 4h for entry/exit levels
-    df["bb_mid_4h"], df["bb_upper_4h"], df["bb_lower_4h"] = bollinger_bands(df["close"], 20)
+    # SMA 20/50, RSI 14, ATR 14 and Bollinger Bands (entry/exit levels) in one pass
+    (
+        df["sma_20_4h"], df["sma_50_4h"], df["rsi_4h"], df["atr_4h"],
+        df["bb_mid_4h"], df["bb_upper_4h"], df["bb_lower_4h"],
+    ) = compute_indicators(
+        float_array(df["high"]), float_array(df["low"]), float_array(df["close"]),
+        20, 50, 14, 14, 20, 2.0,
+    )
 
     # --- 3. DAILY INDICATORS (Trend Context) ---
     # We use the 'D_' columns created during the alignment process
     # D_close is the closing price of the PREVIOUS day (safe to use)
     
     # Fast vs Slow SMA on Daily to find the "Big Trend"
-    df["sma_20_D"] = sma(df["D_close"], 20)
-    df["sma_50_D"] = sma(df["D_close"], 50)
+    df["sma_20_D"], df["sma_50_D"] = sma_dual_array(df["D_close"], 20, 50)
     
     # Daily RSI to see if the higher timeframe is overextended
     df["rsi_D"] = rsi(df["D_close"], 14)
@@ -67,4 +316,4 @@ if __name__ == "__main__":
     print(df[cols_to_show].tail())
 
     # OPTIONAL: Save this as your final feature-ready dataset
-    df.to_csv("data/btc_usdt_features.csv")
+    write_parquet(df, "data/btc_usdt_features.parquet")
@@ -13,7 +13,8 @@ def create_backup(max_keep=10):
     backup_file = BACKUP_ROOT / f"bot_backup_{ts}.tar.gz"
 
     try:
-        with tarfile.open(backup_file, "w:gz") as tar:
+        # State/config are small JSON/YAML: fastest DEFLATE level costs almost nothing in size
+        with tarfile.open(backup_file, "w:gz", compresslevel=1) as tar:
             if STATE_DIR.exists() and any(STATE_DIR.iterdir()):
                 tar.add(STATE_DIR, arcname="state")
             if CONFIG_DIR.exists() and any(CONFIG_DIR.iterdir()):
@@ -1,12 +1,36 @@
+import atexit
 import datetime
 import logging
 import os
+import queue
+import threading
+import time
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Load environment variables from .env file
 load_dotenv()
 
+
+def _telegram_session() -> requests.Session:
+    session = requests.Session()
+    session.headers.update({"Content-Type": "application/json"})
+    # Retry covers connection failures; POSTs are not re-sent after a read error
+    session.mount(
+        "https://",
+        HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=Retry(total=2, backoff_factor=0.5)),
+    )
+    return session
+
+
+_LOG_LEVELS = {"CRITICAL": logging.CRITICAL, "ERROR": logging.ERROR, "WARNING": logging.WARNING}
+
+# Shared by every AlertManager: one pooled TLS connection to api.telegram.org
+_SESSION = _telegram_session()
+
+
 class AlertManager:
     def __init__(self, logger: logging.Logger):
         self.logger = logger
@@ -18,37 +42,62 @@ class AlertManager:
             self.logger.warning(
                 "Telegram alerts disabled: missing TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID"
             )
+            return
+
+        # --- Telegram delivery runs off the trading path ---
+        # send() only enqueues; a daemon worker posts over the shared session.
+        self._q = queue.Queue(maxsize=1024)
+        self._session = _SESSION
+        self._worker_thread = threading.Thread(target=self._worker, name="telegram-alerts", daemon=True)
+        self._worker_thread.start()
+        # Give queued alerts (e.g. a final CRITICAL before a crash) a chance to go out
+        atexit.register(self.flush)
+
+    def _worker(self):
+        url = f"https://api.telegram.org/bot{self.telegram_token}/sendMessage"
+        while True:
+            payload = self._q.get()
+            try:
+                resp = self._session.post(url, json=payload, timeout=10)
+                if resp.status_code != 200:
+                    self.logger.error(f"Telegram alert failed: {resp.text}")
+            except Exception as e:
+                self.logger.error(f"Telegram alert exception: {e}")
+            finally:
+                self._q.task_done()
+
+    def flush(self, timeout: float = 10.0):
+        """Block until queued alerts are delivered, or `timeout` seconds pass."""
+        deadline = time.monotonic() + timeout
+        while self._q.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
 
     def send(self, level: str, message: str, include_info: bool = True):
-        timestamp = datetime.datetime.utcnow().isoformat()
-        structured_msg = f"[ALERT - {level.upper()}] {timestamp} | {message}"
-
-        # --- Log locally ---
-        if level.upper() == "CRITICAL":
-            self.logger.critical(structured_msg)
-        elif level.upper() == "ERROR":
-            self.logger.error(structured_msg)
-        elif level.upper() == "WARNING":
-            self.logger.warning(structured_msg)
-        else:
-            self.logger.info(structured_msg)
+        log_level = level.upper()
+        numeric_level = _LOG_LEVELS.get(log_level, logging.INFO)
 
         # --- Decide if we should send to Telegram ---
-        log_level = level.upper()
         should_send = log_level in ["CRITICAL", "ERROR", "WARNING"]
         if include_info and log_level == "INFO":
             should_send = True
+        should_send = should_send and bool(self.telegram_token and self.chat_id)
+
+        # Nothing will be logged or sent: skip the timestamp and formatting
+        if not should_send and not self.logger.isEnabledFor(numeric_level):
+            return
+
+        timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat()
 
-        if self.telegram_token and self.chat_id and should_send:
+        # --- Log locally (formatted by logging only if a handler emits it) ---
+        self.logger.log(numeric_level, "[ALERT - %s] %s | %s", log_level, timestamp, message)
+
+        if should_send:
+            payload = {
+                "chat_id": self.chat_id,
+                "text": f"[ALERT - {log_level}] {timestamp} | {message}",
+                "parse_mode": "Markdown",
+            }
             try:
-                url = f"https://api.telegram.org/bot{self.telegram_token}/sendMessage"
-                payload = {
-                    "chat_id": self.chat_id,
-                    "text": structured_msg,
-                    "parse_mode": "Markdown",
-                }
-                resp = requests.post(url, json=payload, timeout=10)
-                if resp.status_code != 200:
-                    self.logger.error(f"Telegram alert failed: {resp.text}")
-            except Exception as e:
-                self.logger.error(f"Telegram alert exception: {e}")
+                self._q.put_nowait(payload)
+            except queue.Full:
+                self.logger.warning("Telegram alert queue full, dropping alert")
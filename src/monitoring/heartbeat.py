@@ -1,5 +1,6 @@
-import json
 import os
+
+import orjson
 from datetime import datetime
 
 
@@ -15,5 +16,9 @@ class Heartbeat:
             "details": details or {},
         }
 
-        with open(self.path, "w") as f:
-            json.dump(payload, f, indent=2)
+        # Write a sibling temp file, then rename over the target: readers
+        # (TradingBot's freshness check) never see a half-written heartbeat
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+        os.replace(tmp, self.path)
@@ -1,7 +1,8 @@
+import numpy as np
 import pandas as pd
 from enum import Enum
 
-from src.features.technical import sma, atr
+from src.features.technical import atr_array, float_array, sma_dual_array
 
 
 class MarketRegime(Enum):
@@ -10,12 +11,33 @@ class MarketRegime(Enum):
     UNCERTAIN = "UNCERTAIN"
 
 
+REGIME_DTYPE = pd.CategoricalDtype([r.value for r in MarketRegime])
+_REGIME_CODE = {r: REGIME_DTYPE.categories.get_loc(r.value) for r in MarketRegime}
+
+
+def regime_mask(regime: pd.Series, value: MarketRegime) -> np.ndarray:
+    """
+    Boolean array of rows in the given regime. Categorical columns compare
+    their int8 codes instead of the strings.
+    """
+    if isinstance(regime.dtype, pd.CategoricalDtype):
+        code = regime.cat.categories.get_indexer([value.value])[0]
+        if code < 0:
+            return np.zeros(len(regime), dtype=bool)
+        return regime.cat.codes.to_numpy() == code
+    return regime.to_numpy() == value.value
+
+
 class Strategy(Enum):
     TREND = "TREND"
     RANGE = "RANGE"
     BOLLINGER = "BOLLINGER"
 
 
+# Bits of the uint8 strategy_mask column: mask & STRATEGY_BITS[s] != 0 -> s enabled
+STRATEGY_BITS = {Strategy.TREND: 0b001, Strategy.RANGE: 0b010, Strategy.BOLLINGER: 0b100}
+
+
 class RegimeDetector:
     def __init__(
         self,
@@ -34,48 +56,49 @@ class RegimeDetector:
     def detect(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Detect market regime using historical data + sentiment filters.
-        Returns dataframe with trend_strength, regime, and enabled_strategies columns.
+        Returns dataframe with trend_strength, regime, sentiment_norm and
+        strategy_mask (uint8 bitmask of enabled strategies, see STRATEGY_BITS).
         """
 
-        df = df.copy()
-
-        # --- Technical regime detection ---
-        df["sma_fast"] = sma(df["close"], self.sma_fast_window)
-        df["sma_slow"] = sma(df["close"], self.sma_slow_window)
-        df["atr"] = atr(df, self.atr_window)
-
-        df["trend_strength"] = (
-            (df["sma_fast"] - df["sma_slow"]).abs() / df["atr"]
+        # --- Technical regime detection (arrays; the input frame is not copied) ---
+        close = float_array(df["close"])
+        sma_fast, sma_slow = sma_dual_array(close, self.sma_fast_window, self.sma_slow_window)
+        atr_arr = atr_array(df["high"], df["low"], close, self.atr_window)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            trend_strength = np.abs(sma_fast - sma_slow) / atr_arr
+
+        # RANGE is checked first so it wins over TREND (as the old overwrite order did);
+        # NaN strength stays UNCERTAIN
+        codes = np.select(
+            [trend_strength <= self.range_threshold, trend_strength >= self.trend_threshold],
+            [_REGIME_CODE[MarketRegime.RANGE], _REGIME_CODE[MarketRegime.TREND]],
+            _REGIME_CODE[MarketRegime.UNCERTAIN],
+        ).astype(np.int8)
+        df = pd.DataFrame(
+            {
+                "trend_strength": trend_strength,
+                "regime": pd.Categorical.from_codes(codes, dtype=REGIME_DTYPE),
+                "sentiment_norm": df["sentiment_norm"].to_numpy(),
+            },
+            index=df.index,
         )
 
-        df["regime"] = MarketRegime.UNCERTAIN.value
-        df.loc[df["trend_strength"] >= self.trend_threshold, "regime"] = MarketRegime.TREND.value
-        df.loc[df["trend_strength"] <= self.range_threshold, "regime"] = MarketRegime.RANGE.value
-
         # --- Sentiment filter rules ---
-        def map_strategies(sent):
-            strategies = []
-            if sent > 0.75:  # Extreme Greed
-                strategies += [Strategy.TREND.value, Strategy.RANGE.value, Strategy.BOLLINGER.value]
-            elif sent > 0.5:  # Greed
-                strategies += [Strategy.TREND.value, Strategy.RANGE.value, Strategy.BOLLINGER.value]
-            elif sent >= 0.25:  # Neutral / Fear
-                strategies += [Strategy.RANGE.value, Strategy.BOLLINGER.value]
-            else:  # Extreme Fear
-                strategies = [Strategy.RANGE.value]  # allow MR in Extreme Fear
-            return strategies
+        # Greed+ all three, Neutral/Fear RANGE+BOLLINGER, Extreme Fear RANGE;
+        # NaN sentiment fails every comparison and lands in Extreme Fear
+        sent = df["sentiment_norm"].to_numpy(dtype="float64")
+        df["strategy_mask"] = np.select(
+            [sent > 0.5, sent >= 0.25],
+            [0b111, 0b110],
+            STRATEGY_BITS[Strategy.RANGE],
+        ).astype(np.uint8)
 
-        df["enabled_strategies"] = df["sentiment_norm"].apply(map_strategies)
-
-        return df[["trend_strength", "regime", "enabled_strategies", "sentiment_norm"]]
+        return df[["trend_strength", "regime", "strategy_mask", "sentiment_norm"]]
 
 
 if __name__ == "__main__":
-    df = pd.read_csv(
-        "data/btc_usdt_features.csv",
-        index_col=0,
-        parse_dates=True,
-    )
+    df = pd.read_parquet("data/btc_usdt_features.parquet")
 
     detector = RegimeDetector()
     regimes = detector.detect(df)
@@ -85,11 +108,17 @@ if __name__ == "__main__":
     print(regimes["regime"].value_counts())
 
     # --- Strategy summary by sentiment bucket ---
+    # Count enabled strategies per bucket from the packed strategy_mask
     print("\nEnabled strategies per sentiment bucket:")
-    strategy_summary = (
-        regimes.explode("enabled_strategies")
-        .groupby(pd.cut(regimes["sentiment_norm"], bins=[0, 0.25, 0.5, 0.75, 1.0]))
-        ["enabled_strategies"]
-        .value_counts()
+    buckets = pd.cut(regimes["sentiment_norm"], bins=[0, 0.25, 0.5, 0.75, 1.0])
+    codes = buckets.cat.codes.to_numpy()
+    in_bucket = codes >= 0
+    mask = regimes["strategy_mask"].to_numpy()
+    strategy_summary = pd.DataFrame(
+        {
+            strat.value: np.bincount(codes[in_bucket & (mask & bit != 0)], minlength=len(buckets.cat.categories))
+            for strat, bit in STRATEGY_BITS.items()
+        },
+        index=buckets.cat.categories,
     )
     print(strategy_summary)
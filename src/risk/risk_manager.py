@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from typing import Dict, Any
 
+import numpy as np
+
 
 @dataclass
 class RiskConfig:
@@ -61,3 +63,28 @@ class RiskManager:
             "stop_price": stop_price,
             "reason": "ok",
         }
+
+    def calculate_position_sizes(self, equity, entry_price, stop_price) -> np.ndarray:
+        """
+        Batched calculate_position_size for many trades at once (array-likes,
+        broadcast together). Returns only the sizes: 0.0 wherever the scalar
+        path would reject (invalid stop/entry or below exchange minimum).
+        """
+        equity, entry_price, stop_price = np.broadcast_arrays(
+            np.asarray(equity, dtype=np.float64),
+            np.asarray(entry_price, dtype=np.float64),
+            np.asarray(stop_price, dtype=np.float64),
+        )
+        valid = (stop_price < entry_price) & (entry_price > 0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # --- Risk budget ---
+            raw_size = equity * self.config.risk_per_trade / (entry_price - stop_price)
+            # --- Max exposure cap ---
+            max_size = equity * self.config.max_position_pct / entry_price
+        capped_size = np.minimum(raw_size, max_size)
+
+        # --- Minimum trade value ---
+        valid &= ~(capped_size * entry_price < self.config.min_trade_value)
+
+        return np.where(valid, np.round(capped_size, self.config.precision), 0.0)
@@ -43,5 +43,10 @@ for case in test_cases:
 
 # Convert to DataFrame for summary table
 summary_df = pd.DataFrame(results)
+
+# Same cases through the batched sizer (one NumPy pass)
+summary_df["Batch Size"] = rm.calculate_position_sizes(
+    summary_df["Equity"], summary_df["Entry"], summary_df["Stop"]
+)
 print("\n=== Risk Manager Summary Table ===")
 print(summary_df.to_string(index=False))
@@ -1,26 +1,76 @@
-import json
+import mmap
 import os
-from datetime import datetime
+from datetime import datetime, timezone
+
+import orjson
+
+
+def _log_line(entry) -> bytes:
+    """One NDJSON trade-log line; numpy scalars are native, anything else falls back to str."""
+    return orjson.dumps(entry, default=str, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
 
 
 class StateStore:
-    def __init__(self, path="state/paper_state.json", initial_equity: float = 100.0):
+    """
+    Small snapshot of scalar state (equity, positions, last_update) rewritten on
+    save(), plus an append-only trade log with one JSON line per trade, so saving
+    never re-serializes trade history.
+    """
+
+    def __init__(
+        self,
+        path="state/paper_state.json",
+        initial_equity: float = 100.0,
+        trade_log_path="state/trade_log.jsonl",
+    ):
         self.path = path
+        self.trade_log_path = trade_log_path
+        self._log_file = None
         os.makedirs(os.path.dirname(path), exist_ok=True)
 
         if not os.path.exists(self.path):
             self.save({
                 "equity": initial_equity,
                 "positions": {},
-                "trade_log": [],
                 "last_update": None,
             })
 
     def load(self):
-        with open(self.path, "r") as f:
-            return json.load(f)
+        with open(self.path, "rb") as f:
+            return orjson.loads(f.read())
 
     def save(self, state):
-        state["last_update"] = datetime.utcnow().isoformat()
-        with open(self.path, "w") as f:
-            json.dump(state, f, indent=2)
+        state["last_update"] = datetime.now(timezone.utc).isoformat()
+        # Temp file + rename: a crash mid-write never leaves a torn snapshot
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(state, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+        os.replace(tmp, self.path)
+
+    def load_trade_log(self):
+        """
+        Yield trade-log entries in order. On first use, entries from an old
+        snapshot that still embeds `trade_log` are migrated into the log file
+        and removed from the snapshot.
+        """
+        if not os.path.exists(self.trade_log_path):
+            os.makedirs(os.path.dirname(self.trade_log_path) or ".", exist_ok=True)
+            state = self.load()
+            with open(self.trade_log_path, "wb") as f:
+                for entry in state.get("trade_log", []):
+                    f.write(_log_line(entry))
+            # Drop the migrated history from the snapshot so it is never migrated twice
+            if state.pop("trade_log", None) is not None:
+                self.save(state)
+        if os.path.getsize(self.trade_log_path) == 0:
+            return
+        with open(self.trade_log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b""):
+                if line.strip():
+                    yield orjson.loads(line)
+
+    def append_trade(self, entry):
+        """Append one trade as a JSON line (unbuffered: one write() per trade)."""
+        if self._log_file is None:
+            self._log_file = open(self.trade_log_path, "ab", buffering=0)
+        self._log_file.write(_log_line(entry))
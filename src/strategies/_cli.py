@@ -0,0 +1,41 @@
+import argparse
+import pandas as pd
+
+
+def _diagnostics(signals: pd.DataFrame, sentiment: pd.Series):
+    """Signal counts per sentiment bucket."""
+    print("\nSignals by sentiment bucket:")
+    sentiment_bins = pd.cut(
+        sentiment,
+        bins=[0, 0.25, 0.35, 0.5, 0.75, 1.0],
+        labels=["Extreme Fear", "Neutral", "Fear", "Greed", "Extreme Greed"]
+    )
+    diagnostic = signals.groupby(sentiment_bins)["signal"].value_counts()
+    print(diagnostic)
+
+
+def run_cli(strategy_cls, description: str):
+    """
+    Command-line entry point shared by the strategy modules: runs a default
+    strategy_cls() on the feature set and prints the latest signals and their
+    distribution; --diagnostics adds the counts per sentiment bucket.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--diagnostics",
+        action="store_true",
+        help="Also print signal counts per sentiment bucket",
+    )
+    args = parser.parse_args()
+
+    df = pd.read_parquet("data/btc_usdt_features.parquet")
+
+    strat = strategy_cls()
+    signals = strat.generate_signals(df)
+
+    print(signals.tail(20))
+    print("\nSignal distribution:")
+    print(signals["signal"].value_counts())
+
+    if args.diagnostics:
+        _diagnostics(signals, df["sentiment_norm"])
@@ -1,7 +1,11 @@
 import pandas as pd
 import numpy as np
 from enum import Enum
-from src.regime.regime_detector import MarketRegime
+from src.regime.regime_detector import MarketRegime, regime_mask
+from src.strategies._cli import run_cli
+from src.strategies.signal_kernels import (
+    SIGNAL_CARRY, SIGNAL_LONG, carry_forward, signal_labels,
+)
 
 
 class BollingerSignal(Enum):
@@ -14,69 +18,43 @@ class BollingerStrategy:
         self.atr_stop_mult = atr_stop_mult
 
     def generate_signals(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
-
-        # --- Required columns (no enabled_strategies) ---
+        # --- Required columns (no strategy_mask) ---
         required = ["close", "regime", "sentiment_norm",
                     "bb_mid_D", "bb_upper_D", "bb_lower_D", "atr_D"]
         missing = [c for c in required if c not in df.columns]
         if missing:
             raise ValueError(f"Missing required columns: {missing}")
 
-        df["signal"] = BollingerSignal.FLAT.value
-        df["stop_price"] = np.nan
+        close = df["close"].to_numpy(dtype="float64")
+        sent = df["sentiment_norm"].to_numpy(dtype="float64")
+        atr_d = df["atr_D"].to_numpy(dtype="float64")
 
         # --- Entry condition ---
         long_condition = (
-            (df["regime"] == MarketRegime.RANGE.value)
-            & (df["close"] > df["bb_upper_D"])
-            & (df["sentiment_norm"] > 0.35)   # allow Fear (0.35–0.5), Greed, Extreme Greed
+            regime_mask(df["regime"], MarketRegime.RANGE)
+            & (close > df["bb_upper_D"].to_numpy(dtype="float64"))
+            & (sent > 0.35)   # allow Fear (0.35–0.5), Greed, Extreme Greed
         )
 
-        df.loc[long_condition, "signal"] = BollingerSignal.LONG.value
-        df.loc[long_condition, "stop_price"] = df["close"] - df["atr_D"] * self.atr_stop_mult
-
         # --- Exit condition ---
         exit_condition = (
-            (df["close"] < df["bb_mid_D"])      # price falls back below mid-band
-            | (df["sentiment_norm"] <= 0.35)    # force exit in Neutral or Extreme Fear
-        )
-        df.loc[exit_condition, "signal"] = BollingerSignal.FLAT.value
-        df.loc[exit_condition, "stop_price"] = np.nan
-
-        # --- Persistence ---
-        df["signal"] = (
-            df["signal"].replace(BollingerSignal.FLAT.value, np.nan).ffill().fillna(BollingerSignal.FLAT.value)
+            (close < df["bb_mid_D"].to_numpy(dtype="float64"))  # price falls back below mid-band
+            | (sent <= 0.35)    # force exit in Neutral or Extreme Fear
         )
-        df["stop_price"] = df["stop_price"].ffill()
-        df.loc[df["signal"] == BollingerSignal.FLAT.value, "stop_price"] = np.nan
 
-        # --- Final sentiment override ---
-        df.loc[df["sentiment_norm"] <= 0.35, "signal"] = BollingerSignal.FLAT.value
-        df.loc[df["sentiment_norm"] <= 0.35, "stop_price"] = np.nan
+        # --- Persistence + final sentiment override (one carry-forward scan) ---
+        # An exit bar is FLAT, and FLAT bars carry the previous state forward;
+        # only the sentiment override forces FLAT, on its own bars
+        entry = long_condition & ~exit_condition
+        signal = np.where(entry, SIGNAL_LONG, SIGNAL_CARRY).astype(np.int8)
+        stop_price = np.where(entry, close - atr_d * self.atr_stop_mult, np.nan)
+        carry_forward(signal, stop_price, sent <= 0.35)
 
-        return df[["signal", "stop_price", "bb_upper_D", "bb_lower_D", "bb_mid_D", "atr_D", "sentiment_norm"]]
+        out = df[["bb_upper_D", "bb_lower_D", "bb_mid_D", "atr_D"]]
+        out.insert(0, "signal", signal_labels(signal))
+        out.insert(1, "stop_price", stop_price)
+        return out
 
 
 if __name__ == "__main__":
-    features_df = pd.read_csv(
-        "data/btc_usdt_features.csv",
-        index_col=0,
-        parse_dates=True,
-    )
-
-    strat = BollingerStrategy()
-    signals = strat.generate_signals(features_df)
-
-    print(signals.tail(20))
-    print("\nSignal distribution:")
-    print(signals["signal"].value_counts())
-
-    print("\nSignals by sentiment bucket (refined):")
-    sentiment_bins = pd.cut(
-        signals["sentiment_norm"],
-        bins=[0, 0.25, 0.35, 0.5, 0.75, 1.0],
-        labels=["Extreme Fear", "Neutral", "Fear", "Greed", "Extreme Greed"]
-    )
-    diagnostic = signals.groupby(sentiment_bins)["signal"].value_counts()
-    print(diagnostic)
+    run_cli(BollingerStrategy, "Generate Bollinger signals on the feature set")
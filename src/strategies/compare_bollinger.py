@@ -4,7 +4,7 @@ from src.strategies.bollinger import BollingerStrategy as OriginalBollinger
 from src.strategies.bollinger_refined import BollingerStrategy as RefinedBollinger
 
 # Load features
-df = pd.read_csv("data/btc_usdt_features.csv", index_col=0, parse_dates=True)
+df = pd.read_parquet("data/btc_usdt_features.parquet")
 
 bt = EventBacktester(initial_capital=500)
 
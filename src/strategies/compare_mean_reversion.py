@@ -1,10 +1,20 @@
 import pandas as pd
 from src.backtest.event_backtester import EventBacktester
+from src.features.technical import (
+    atr, atr_column, bollinger_bands, bollinger_columns, rsi, rsi_column,
+)
 from src.strategies.mean_reversion import MeanReversionStrategy  # original
 from src.strategies.mean_reversion_refined import MeanReversionStrategy as RefinedMR  # refined
 
 # Load features
-df = pd.read_csv("data/btc_usdt_features.csv", index_col=0, parse_dates=True)
+df = pd.read_parquet("data/btc_usdt_features.parquet")
+
+# Both variants use RSI(14), BB(20, 2) and ATR(14): compute them once here and
+# let generate_signals pick up the columns instead of recomputing per strategy
+df[rsi_column(14)] = rsi(df["close"], 14)
+for col, band in zip(bollinger_columns(20, 2.0), bollinger_bands(df["close"], 20, 2.0)):
+    df[col] = band
+df[atr_column(14)] = atr(df, 14)
 
 bt = EventBacktester(initial_capital=500)
 
@@ -4,13 +4,16 @@ from src.strategies.trend_following import TrendFollowingStrategy  # original
 from src.strategies.trend_following_refined import TrendFollowingStrategy as RefinedTrend  # refined
 
 # Load features
-df = pd.read_csv("data/btc_usdt_features.csv", index_col=0, parse_dates=True)
+df = pd.read_parquet("data/btc_usdt_features.parquet")
 
 bt = EventBacktester(initial_capital=500)
 
+# Extract the input arrays once; both variants read the same prepared inputs
+inputs = TrendFollowingStrategy.prepare(df)
+
 # --- Original Trend Following ---
 orig_strat = TrendFollowingStrategy()
-orig_signals = orig_strat.generate_signals(df)
+orig_signals = orig_strat.generate_signals(inputs)
 
 # Adapt to backtester format
 orig_intent = orig_signals.rename(columns={"signal": "intent"})
@@ -21,7 +24,7 @@ orig_summary = bt.summary(orig_results)
 
 # --- Refined Trend Following ---
 ref_strat = RefinedTrend()
-ref_signals = ref_strat.generate_signals(df)
+ref_signals = ref_strat.generate_signals(inputs)
 
 # Adapt to backtester format
 ref_intent = ref_signals.rename(columns={"signal": "intent"})
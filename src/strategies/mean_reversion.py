@@ -2,8 +2,14 @@ import pandas as pd
 import numpy as np
 from enum import Enum
 
-from src.features.technical import rsi, atr, bollinger_bands
-from src.regime.regime_detector import MarketRegime
+from src.features.technical import (
+    atr, atr_column, bollinger_bands, bollinger_columns, rsi, rsi_column,
+)
+from src.regime.regime_detector import MarketRegime, regime_mask
+from src.strategies._cli import run_cli
+from src.strategies.signal_kernels import (
+    SIGNAL_CARRY, SIGNAL_LONG, carry_forward, signal_labels,
+)
 
 
 class MeanReversionSignal(Enum):
@@ -33,82 +39,61 @@ class MeanReversionStrategy:
     def generate_signals(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Generate mean-reversion signals with sentiment filtering and exit logic.
-        Requires 'regime' and 'sentiment_norm' columns in df.
+        Requires 'regime' and 'sentiment_norm' columns in df. Precomputed indicator
+        columns are used as-is when present under the names rsi_column,
+        bollinger_columns and atr_column give for this strategy's windows.
         """
 
-        df = df.copy()
-
-        df["rsi"] = rsi(df["close"], self.rsi_window)
-        df["bb_mid"], df["bb_upper"], df["bb_lower"] = bollinger_bands(
-            df["close"], self.bb_window, self.bb_std
-        )
-        df["atr"] = atr(df, self.atr_window)
-
-        df["signal"] = MeanReversionSignal.FLAT.value
-        df["stop_price"] = np.nan
+        close = df["close"].to_numpy(dtype="float64")
+        sent = df["sentiment_norm"].to_numpy(dtype="float64")
+
+        # --- Indicators (reuse columns the frame already carries) ---
+        rsi_col = rsi_column(self.rsi_window)
+        rsi_s = df[rsi_col] if rsi_col in df.columns else rsi(df["close"], self.rsi_window)
+        bb_cols = bollinger_columns(self.bb_window, self.bb_std)
+        if set(bb_cols).issubset(df.columns):
+            bb_mid, bb_upper, bb_lower = (df[c] for c in bb_cols)
+        else:
+            bb_mid, bb_upper, bb_lower = bollinger_bands(df["close"], self.bb_window, self.bb_std)
+        atr_col = atr_column(self.atr_window)
+        atr_s = df[atr_col] if atr_col in df.columns else atr(df, self.atr_window)
+        rsi_arr = rsi_s.to_numpy()
 
         # --- Entry condition ---
         long_condition = (
-            (df["regime"] == MarketRegime.RANGE.value)
-            & (df["rsi"] < self.rsi_entry)
-            & (df["close"] < df["bb_lower"])
-            & (df["sentiment_norm"] > 0.35)   # only allow Fear (0.35–0.5), Greed, Extreme Greed
-        )
-
-        df.loc[long_condition, "signal"] = MeanReversionSignal.LONG.value
-        df.loc[long_condition, "stop_price"] = (
-            df["close"] - df["atr"] * self.atr_stop_mult
+            regime_mask(df["regime"], MarketRegime.RANGE)
+            & (rsi_arr < self.rsi_entry)
+            & (close < bb_lower.to_numpy())
+            & (sent > 0.35)   # only allow Fear (0.35–0.5), Greed, Extreme Greed
         )
 
         # --- Exit condition ---
         exit_condition = (
-            (df["rsi"] > self.rsi_exit)
-            | (df["close"] > df["bb_mid"])
-            | (df["sentiment_norm"] <= 0.35)  # force exit in Neutral or Extreme Fear
+            (rsi_arr > self.rsi_exit)
+            | (close > bb_mid.to_numpy())
+            | (sent <= 0.35)  # force exit in Neutral or Extreme Fear
         )
-        df.loc[exit_condition, "signal"] = MeanReversionSignal.FLAT.value
-        df.loc[exit_condition, "stop_price"] = np.nan
 
-        # --- Persist positions until exit ---
-        df["signal"] = (
-            df["signal"]
-            .replace(MeanReversionSignal.FLAT.value, np.nan)
-            .ffill()
-            .fillna(MeanReversionSignal.FLAT.value)
+        # --- Persistence + sentiment override (one carry-forward scan) ---
+        # Entry bars open LONG and other bars carry the previous state; the
+        # override forces FLAT (NaN stop) on its own bars without ending it
+        entry = long_condition & ~exit_condition
+        signal = np.where(entry, SIGNAL_LONG, SIGNAL_CARRY).astype(np.int8)
+        stop_price = np.where(entry, close - atr_s.to_numpy() * self.atr_stop_mult, np.nan)
+        carry_forward(signal, stop_price, sent <= 0.35)
+
+        return pd.DataFrame(
+            {
+                "signal": signal_labels(signal),
+                "stop_price": stop_price,
+                "rsi": rsi_s,
+                "bb_upper": bb_upper,
+                "bb_lower": bb_lower,
+                "atr": atr_s,
+            },
+            index=df.index,
         )
-        df["stop_price"] = df["stop_price"].ffill()
-        df.loc[df["signal"] == MeanReversionSignal.FLAT.value, "stop_price"] = np.nan
-
-        # --- Sentiment override (final safeguard) ---
-        df.loc[df["sentiment_norm"] <= 0.35, "signal"] = MeanReversionSignal.FLAT.value
-        df.loc[df["sentiment_norm"] <= 0.35, "stop_price"] = np.nan
-
-        return df[
-            ["signal", "stop_price", "rsi", "bb_upper", "bb_lower", "atr", "sentiment_norm"]
-        ]
-
 
 
 if __name__ == "__main__":
-    df = pd.read_csv(
-        "data/btc_usdt_features.csv",
-        index_col=0,
-        parse_dates=True,
-    )
-
-    strat = MeanReversionStrategy()
-    signals = strat.generate_signals(df)
-
-    print(signals.tail(20))
-    print("\nSignal distribution:")
-    print(signals["signal"].value_counts())
-
-    # --- Diagnostic: signals by sentiment bucket ---
-    print("\nSignals by sentiment bucket:")
-    sentiment_bins = pd.cut(
-        signals["sentiment_norm"],
-        bins=[0, 0.25, 0.35, 0.5, 0.75, 1.0],
-        labels=["Extreme Fear", "Neutral", "Fear", "Greed", "Extreme Greed"]
-    )
-    diagnostic = signals.groupby(sentiment_bins)["signal"].value_counts()
-    print(diagnostic)
+    run_cli(MeanReversionStrategy, "Generate mean-reversion signals on the feature set")
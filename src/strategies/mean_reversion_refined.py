@@ -2,8 +2,14 @@ import pandas as pd
 import numpy as np
 from enum import Enum
 
-from src.features.technical import rsi, atr, bollinger_bands
-from src.regime.regime_detector import MarketRegime
+from src.features.technical import (
+    atr, atr_column, bollinger_bands, bollinger_columns, rsi, rsi_column,
+)
+from src.regime.regime_detector import MarketRegime, regime_mask
+from src.strategies._cli import run_cli
+from src.strategies.signal_kernels import (
+    SIGNAL_CARRY, SIGNAL_LONG, carry_forward, ratchet_stops, signal_labels,
+)
 
 # --- Candle pattern helpers ---
 def is_hammer(row):
@@ -18,6 +24,24 @@ def is_doji(row):
     candle_range = row["high"] - row["low"]
     return candle_range > 0 and (body / candle_range < 0.1)
 
+# Whole-frame versions of the helpers above (one pass over the OHLC arrays)
+def is_hammer_vec(df: pd.DataFrame) -> np.ndarray:
+    o, h, l, c = np.ascontiguousarray(df[["open", "high", "low", "close"]].to_numpy(dtype="float64").T)
+    body = np.abs(c - o)
+    candle_range = h - l
+    lower_shadow = np.minimum(c, o) - l
+    upper_shadow = h - np.maximum(c, o)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        small_body = body / candle_range < 0.3
+    return (lower_shadow > 2 * body) & (upper_shadow < body) & small_body
+
+def is_doji_vec(df: pd.DataFrame) -> np.ndarray:
+    o, h, l, c = np.ascontiguousarray(df[["open", "high", "low", "close"]].to_numpy(dtype="float64").T)
+    body = np.abs(c - o)
+    candle_range = h - l
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (candle_range > 0) & (body / candle_range < 0.1)
+
 
 class MeanReversionSignal(Enum):
     LONG = "LONG"
@@ -46,89 +70,70 @@ class MeanReversionStrategy:
     def generate_signals(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Mean-reversion signals with stricter sentiment filtering,
-        candle confirmation, and trailing stop exits.
+        candle confirmation, and trailing stop exits. Precomputed indicator
+        columns are used as-is when present under the names rsi_column,
+        bollinger_columns and atr_column give for this strategy's windows.
         """
 
-        df = df.copy()
-
-        # --- Indicators ---
-        df["rsi"] = rsi(df["close"], self.rsi_window)
-        df["bb_mid"], df["bb_upper"], df["bb_lower"] = bollinger_bands(
-            df["close"], self.bb_window, self.bb_std
-        )
-        df["atr"] = atr(df, self.atr_window)
-
-        df["signal"] = MeanReversionSignal.FLAT.value
-        df["stop_price"] = np.nan
+        close = df["close"].to_numpy(dtype="float64")
+        sent = df["sentiment_norm"].to_numpy(dtype="float64")
+
+        # --- Indicators (reuse columns the frame already carries) ---
+        rsi_col = rsi_column(self.rsi_window)
+        rsi_s = df[rsi_col] if rsi_col in df.columns else rsi(df["close"], self.rsi_window)
+        bb_cols = bollinger_columns(self.bb_window, self.bb_std)
+        if set(bb_cols).issubset(df.columns):
+            bb_mid, bb_upper, bb_lower = (df[c] for c in bb_cols)
+        else:
+            bb_mid, bb_upper, bb_lower = bollinger_bands(df["close"], self.bb_window, self.bb_std)
+        atr_col = atr_column(self.atr_window)
+        atr_s = df[atr_col] if atr_col in df.columns else atr(df, self.atr_window)
+        rsi_arr = rsi_s.to_numpy()
+        atr_arr = atr_s.to_numpy()
 
         # --- Entry condition with candle confirmation ---
         long_condition = (
-            (df["regime"] == MarketRegime.RANGE.value)
-            & (df["rsi"] < 30)
-            & (df["close"] < df["bb_lower"] * 1.01)
-            & (df["sentiment_norm"] <= 0.35)   # only Greed & Extreme Greed
-            #& (df.apply(is_hammer, axis=1) | df.apply(is_doji, axis=1))  # candle confirmation
-        )
-
-        df.loc[long_condition, "signal"] = MeanReversionSignal.LONG.value
-        df.loc[long_condition, "stop_price"] = (
-            df["close"] - df["atr"] * self.atr_stop_mult
+            regime_mask(df["regime"], MarketRegime.RANGE)
+            & (rsi_arr < 30)
+            & (close < bb_lower.to_numpy() * 1.01)
+            & (sent <= 0.35)   # only Greed & Extreme Greed
+            #& (is_hammer_vec(df) | is_doji_vec(df))  # candle confirmation
         )
 
         # --- Exit condition (standard) ---
         exit_condition = (
-            (df["rsi"] > self.rsi_exit)
-            | (df["close"] > df["bb_mid"])
-            
+            (rsi_arr > self.rsi_exit)
+            | (close > bb_mid.to_numpy())
         )
-        df.loc[exit_condition, "signal"] = MeanReversionSignal.FLAT.value
-        df.loc[exit_condition, "stop_price"] = np.nan
-
-        # --- Persistence ---
-        df["signal"] = (
-            df["signal"]
-            .replace(MeanReversionSignal.FLAT.value, np.nan)
-            .ffill()
-            .fillna(MeanReversionSignal.FLAT.value)
-        )
-        df["stop_price"] = df["stop_price"].ffill()
-        df.loc[df["signal"] == MeanReversionSignal.FLAT.value, "stop_price"] = np.nan
 
-        # --- Sentiment override ---
-        #df.loc[df["sentiment_norm"] <= 0.5, "signal"] = MeanReversionSignal.FLAT.value
-        #df.loc[df["sentiment_norm"] <= 0.5, "stop_price"] = np.nan
+        # --- Persistence (one carry-forward scan) ---
+        # The sentiment override is disabled here: pass sent <= 0.5 as the
+        # force-FLAT mask to re-enable it
+        entry = long_condition & ~exit_condition
+        signal = np.where(entry, SIGNAL_LONG, SIGNAL_CARRY).astype(np.int8)
+        stop_price = np.where(entry, close - atr_arr * self.atr_stop_mult, np.nan)
+        carry_forward(signal, stop_price, np.zeros(len(signal), dtype=np.bool_))
 
         # --- Trailing stop update ---
-        # If in LONG, trail stop behind close by ATR * multiplier
-        trailing_stop = df["close"] - df["atr"] * self.atr_stop_mult
-        df.loc[df["signal"] == MeanReversionSignal.LONG.value, "stop_price"] = np.maximum(
-            df["stop_price"], trailing_stop
+        # If in LONG, trail stop behind close by ATR * multiplier; it only ratchets
+        # up for the life of the position
+        trailing_stop = close - atr_arr * self.atr_stop_mult
+        in_long = signal == SIGNAL_LONG
+        stop_price[in_long] = np.maximum(stop_price[in_long], trailing_stop[in_long])
+        ratchet_stops(signal, stop_price)
+
+        return pd.DataFrame(
+            {
+                "signal": signal_labels(signal),
+                "stop_price": stop_price,
+                "rsi": rsi_s,
+                "bb_upper": bb_upper,
+                "bb_lower": bb_lower,
+                "atr": atr_s,
+            },
+            index=df.index,
         )
 
-        return df[
-            ["signal", "stop_price", "rsi", "bb_upper", "bb_lower", "atr", "sentiment_norm"]
-        ]
-
 
 if __name__ == "__main__":
-    df = pd.read_csv(
-        "data/btc_usdt_features.csv",
-        index_col=0,
-        parse_dates=True,
-    )
-
-    strat = MeanReversionStrategy()
-    signals = strat.generate_signals(df)
-
-    print(signals.tail(20))
-    print("\nSignal distribution:")
-    print(signals["signal"].value_counts())
-
-    print("\nSignals by sentiment bucket:")
-    sentiment_bins = pd.cut(
-        signals["sentiment_norm"],
-        bins=[0, 0.25, 0.35, 0.5, 0.75, 1.0],
-        labels=["Extreme Fear", "Neutral", "Fear", "Greed", "Extreme Greed"]
-    )
-    diagnostic = signals.groupby(sentiment_bins)["signal"].value_counts()
-    print(diagnostic)
+    run_cli(MeanReversionStrategy, "Generate refined mean-reversion signals on the feature set")
@@ -0,0 +1,357 @@
+import itertools
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+from numba import njit, prange
+
+from src.features.technical import float_array, true_range_array
+from src.regime.regime_detector import MarketRegime, regime_mask
+
+# int8 signal states shared by every strategy's LONG/FLAT enum.
+# SIGNAL_CARRY marks "no new information on this bar": keep the previous state.
+SIGNAL_FLAT, SIGNAL_LONG, SIGNAL_CARRY = 0, 1, -1
+
+# Output dtype of every signal column: category codes are the int8 states themselves
+SIGNAL_DTYPE = pd.CategoricalDtype(["FLAT", "LONG"])
+
+
+@njit(cache=True)
+def carry_forward(sig: np.ndarray, stop: np.ndarray, force_flat: np.ndarray):
+    """
+    In place, one pass over raw entry codes (SIGNAL_LONG on entry bars,
+    SIGNAL_CARRY elsewhere) and entry stops (NaN elsewhere):
+    - SIGNAL_CARRY bars keep the previous state (FLAT before the first decision);
+    - stops carry the last non-NaN entry stop, and are NaN on FLAT bars;
+    - force_flat bars (the sentiment override) are written FLAT with a NaN stop
+      but do not end the carried state, so the next bar resumes it.
+    Same as the old replace(FLAT, NaN).ffill().fillna(FLAT) on the signal,
+    ffill() on the stop, then the FLAT/override masking.
+    """
+    state = SIGNAL_FLAT
+    carried_stop = np.nan
+    for i in range(len(sig)):
+        if sig[i] != SIGNAL_CARRY:
+            state = sig[i]
+        if not np.isnan(stop[i]):
+            carried_stop = stop[i]
+        if force_flat[i] or state == SIGNAL_FLAT:
+            sig[i] = SIGNAL_FLAT
+            stop[i] = np.nan
+        else:
+            sig[i] = state
+            stop[i] = carried_stop
+
+
+@njit(cache=True)
+def ratchet_stops(sig: np.ndarray, stop: np.ndarray):
+    """
+    In place, one pass: within each run of consecutive SIGNAL_LONG bars the stop
+    never moves down (running max from the run's first bar); a NaN stop inside
+    a run keeps the level already reached.
+    """
+    for i in range(1, len(sig)):
+        if sig[i] == SIGNAL_LONG and sig[i - 1] == SIGNAL_LONG and not np.isnan(stop[i - 1]):
+            if np.isnan(stop[i]) or stop[i - 1] > stop[i]:
+                stop[i] = stop[i - 1]
+
+
+@njit(cache=True)
+def true_range_step(high, low, prev_close):
+    """True range of one bar (prev_close NaN on the first bar), as technical.atr."""
+    t = high - low
+    up = abs(high - prev_close)
+    down = abs(low - prev_close)
+    if not np.isnan(prev_close):
+        if np.isnan(t) or up > t:
+            t = up
+        if np.isnan(t) or down > t:
+            t = down
+    return t
+
+
+@njit(cache=True)
+def running_sum_step(total, nan_count, new, leaving, window_full):
+    """
+    Advance a running window sum by one value: add `new`, and once the window
+    is full subtract `leaving` (the value dropping out). NaNs are counted
+    instead of summed; the window mean is NaN while nan_count > 0.
+    """
+    if np.isnan(new):
+        nan_count += 1
+    else:
+        total += new
+    if window_full:
+        if np.isnan(leaving):
+            nan_count -= 1
+        else:
+            total -= leaving
+    return total, nan_count
+
+
+@njit(cache=True)
+def running_mean(x, window):
+    """Trailing mean via running_sum_step: the same values trend_signals fills."""
+    n = len(x)
+    out = np.full(n, np.nan)
+    total, nan_count = 0.0, 0
+    for i in range(n):
+        total, nan_count = running_sum_step(
+            total, nan_count, x[i], x[i - window] if i >= window else 0.0, i >= window)
+        if i >= window - 1 and nan_count == 0:
+            out[i] = total / window
+    return out
+
+
+@njit(cache=True)
+def trend_step(state, carried_stop, prev_sig, prev_stop, close, is_trend, sent,
+               sma_fast, sma_slow, atr, atr_stop_mult, sent_exit, sent_max, trail):
+    """
+    One bar of the trend-following state machine:
+    - entry: sma_fast > sma_slow, TREND regime, sent_exit < sentiment < sent_max
+      (the entry can never coincide with the exit below);
+    - exit/override: sentiment <= sent_exit forces FLAT on that bar, other bars
+      carry the last state (FLAT before the first entry);
+    - stop: the last non-NaN entry stop (close - atr * mult), NaN when FLAT;
+      with `trail`, LONG bars take max(stop, close - atr * mult), and the result
+      only ratchets up until the position goes FLAT.
+    Returns (state, carried_stop, signal, stop) with the state to carry on.
+    """
+    level = close - atr * atr_stop_mult
+    if sma_fast > sma_slow and is_trend and sent > sent_exit and sent < sent_max:
+        state = SIGNAL_LONG
+        if not np.isnan(level):
+            carried_stop = level
+
+    if sent <= sent_exit or state == SIGNAL_FLAT:
+        return state, carried_stop, SIGNAL_FLAT, np.nan
+
+    stop = carried_stop
+    if trail:
+        if np.isnan(stop) or np.isnan(level):
+            stop = np.nan
+        elif level > stop:
+            stop = level
+        # Ratchet within the position (as ratchet_stops): never below the
+        # previous LONG bar's stop, and a NaN keeps the level reached
+        if prev_sig == SIGNAL_LONG and not np.isnan(prev_stop):
+            if np.isnan(stop) or prev_stop > stop:
+                stop = prev_stop
+    return state, carried_stop, SIGNAL_LONG, stop
+
+
+@njit(cache=True)
+def trend_signals(high, low, close, is_trend, sent, w_fast, w_slow, w_atr, atr_stop_mult,
+                  sent_exit, sent_max, trail, sma_fast, sma_slow, atr, have_indicators):
+    """
+    Trend-following indicators and signals fused into one pass over the bars.
+    Unless `have_indicators`, each bar first fills SMA(fast), SMA(slow) and ATR
+    into the given NaN-initialised buffers with running window sums (same
+    definitions as technical.sma/atr, up to float rounding); it then steps
+    trend_step. Returns (int8 signal, stop_price).
+    """
+    n = len(close)
+    out_sig = np.empty(n, dtype=np.int8)
+    out_stop = np.empty(n)
+    tr = np.empty(0 if have_indicators else n)
+    sum_fast, sum_slow, sum_atr = 0.0, 0.0, 0.0
+    nan_fast, nan_slow, nan_atr = 0, 0, 0
+
+    state = SIGNAL_FLAT
+    carried_stop = np.nan
+    prev_sig = SIGNAL_FLAT
+    prev_stop = np.nan
+    for i in range(n):
+        # --- Indicators for bar i (add the new bar, drop the one leaving) ---
+        if not have_indicators:
+            tr[i] = true_range_step(high[i], low[i], close[i - 1] if i > 0 else np.nan)
+            sum_fast, nan_fast = running_sum_step(
+                sum_fast, nan_fast, close[i], close[i - w_fast] if i >= w_fast else 0.0, i >= w_fast)
+            sum_slow, nan_slow = running_sum_step(
+                sum_slow, nan_slow, close[i], close[i - w_slow] if i >= w_slow else 0.0, i >= w_slow)
+            sum_atr, nan_atr = running_sum_step(
+                sum_atr, nan_atr, tr[i], tr[i - w_atr] if i >= w_atr else 0.0, i >= w_atr)
+            if i >= w_fast - 1 and nan_fast == 0:
+                sma_fast[i] = sum_fast / w_fast
+            if i >= w_slow - 1 and nan_slow == 0:
+                sma_slow[i] = sum_slow / w_slow
+            if i >= w_atr - 1 and nan_atr == 0:
+                atr[i] = sum_atr / w_atr
+
+        # --- Signal state ---
+        state, carried_stop, prev_sig, prev_stop = trend_step(
+            state, carried_stop, prev_sig, prev_stop, close[i], is_trend[i], sent[i],
+            sma_fast[i], sma_slow[i], atr[i], atr_stop_mult, sent_exit, sent_max, trail,
+        )
+        out_sig[i] = prev_sig
+        out_stop[i] = prev_stop
+
+    return out_sig, out_stop
+
+
+class TrendInputs(NamedTuple):
+    """
+    The arrays a trend strategy reads, extracted once per session (regime
+    strings/codes reduced to a bool mask, prices and sentiment as C-contiguous
+    float64) and shared across strategy variants and parameter sweeps.
+    """
+    index: pd.Index
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    is_trend: np.ndarray
+    sent: np.ndarray
+    # ("sma", window) / ("atr", window) -> indicator array, filled by run_trend_signals
+    indicators: dict
+
+
+def prepare_trend_inputs(df: pd.DataFrame) -> TrendInputs:
+    """Validate df and extract its TrendInputs."""
+    for col in ["high", "low", "close", "regime", "sentiment_norm"]:
+        if col not in df.columns:
+            raise ValueError(f"Missing required column: {col}")
+    return TrendInputs(
+        df.index,
+        float_array(df["high"]),
+        float_array(df["low"]),
+        float_array(df["close"]),
+        regime_mask(df["regime"], MarketRegime.TREND),
+        float_array(df["sentiment_norm"]),
+        {},
+    )
+
+
+def run_trend_signals(inputs: TrendInputs, w_fast, w_slow, w_atr, atr_stop_mult,
+                      sent_exit, sent_max, trail):
+    """
+    trend_signals over prepared inputs. Indicators already computed for these
+    windows on the same inputs are reused, new ones are cached on them.
+    Returns (int8 signal, stop_price, sma_fast, sma_slow, atr).
+    """
+    cache = inputs.indicators
+    keys = (("sma", w_fast), ("sma", w_slow), ("atr", w_atr))
+    have_indicators = all(k in cache for k in keys)
+    if have_indicators:
+        sma_fast, sma_slow, atr = (cache[k] for k in keys)
+    else:
+        n = len(inputs.close)
+        sma_fast, sma_slow, atr = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+
+    signal, stop_price = trend_signals(
+        inputs.high, inputs.low, inputs.close, inputs.is_trend, inputs.sent,
+        w_fast, w_slow, w_atr, atr_stop_mult, sent_exit, sent_max, trail,
+        sma_fast, sma_slow, atr, have_indicators,
+    )
+    if not have_indicators:
+        cache.update(zip(keys, (sma_fast, sma_slow, atr)))
+    return signal, stop_price, sma_fast, sma_slow, atr
+
+
+@njit(parallel=True, cache=True)
+def _trend_grid(high, low, close, is_trend, sent, fast_ws, slow_ws, atr_ws, mults,
+                sent_exit, sent_max, trail, smas, fast_idx, slow_idx, atrs, atr_idx,
+                out_sig, out_stop):
+    # One row per parameter combination, each on its own thread; the
+    # indicator rows are shared, so only the state machine runs per row
+    for k in prange(len(mults)):
+        sig, stop = trend_signals(
+            high, low, close, is_trend, sent, fast_ws[k], slow_ws[k], atr_ws[k], mults[k],
+            sent_exit, sent_max, trail,
+            smas[fast_idx[k]], smas[slow_idx[k]], atrs[atr_idx[k]], True,
+        )
+        out_sig[k] = sig
+        out_stop[k] = stop
+
+
+def run_trend_grid(inputs: TrendInputs, fast_ws, slow_ws, atr_ws, mults,
+                   sent_exit, sent_max, trail):
+    """
+    trend_signals for K parameter combinations (equal-length window/multiplier
+    arrays) over the same inputs. Each distinct SMA/ATR window is computed
+    once (and cached on inputs like run_trend_signals does), then the state
+    machine runs per combination in parallel.
+    Returns (int8 signal, stop_price), both (K, n).
+    """
+    fast_ws, slow_ws, atr_ws = (np.asarray(w, dtype=np.int64) for w in (fast_ws, slow_ws, atr_ws))
+    mults = np.asarray(mults, dtype=np.float64)
+    cache = inputs.indicators
+
+    sma_windows = np.unique(np.concatenate([fast_ws, slow_ws]))
+    atr_windows = np.unique(atr_ws)
+    for w in sma_windows:
+        if ("sma", w) not in cache:
+            cache[("sma", w)] = running_mean(inputs.close, w)
+    if any(("atr", w) not in cache for w in atr_windows):
+        tr = true_range_array(inputs.high, inputs.low, inputs.close)
+        for w in atr_windows:
+            if ("atr", w) not in cache:
+                cache[("atr", w)] = running_mean(tr, w)
+    smas = np.stack([cache[("sma", w)] for w in sma_windows])
+    atrs = np.stack([cache[("atr", w)] for w in atr_windows])
+
+    n = len(inputs.close)
+    out_sig = np.empty((len(mults), n), dtype=np.int8)
+    out_stop = np.empty((len(mults), n))
+    _trend_grid(
+        inputs.high, inputs.low, inputs.close, inputs.is_trend, inputs.sent,
+        fast_ws, slow_ws, atr_ws, mults, sent_exit, sent_max, trail,
+        smas, np.searchsorted(sma_windows, fast_ws), np.searchsorted(sma_windows, slow_ws),
+        atrs, np.searchsorted(atr_windows, atr_ws), out_sig, out_stop,
+    )
+    return out_sig, out_stop
+
+
+class SignalArrays(NamedTuple):
+    """Signal output without the DataFrame: int8 SIGNAL_* codes and stops."""
+    signal: np.ndarray
+    stop_price: np.ndarray
+
+
+TREND_GRID_PARAMS = ["sma_fast_window", "sma_slow_window", "atr_window", "atr_stop_mult"]
+
+
+class TrendGrid(NamedTuple):
+    """
+    Grid run: row k of signal (int8 SIGNAL_* codes) and stop_price, both
+    (K, n), belongs to row k of params.
+    """
+    params: pd.DataFrame
+    signal: np.ndarray
+    stop_price: np.ndarray
+
+
+def expand_trend_grid(strategy, param_grid: dict) -> pd.DataFrame:
+    """
+    Every combination of the lists in param_grid (keys from TREND_GRID_PARAMS),
+    one row each; parameters not in the grid keep the strategy's own value.
+    """
+    unknown = set(param_grid) - set(TREND_GRID_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown grid parameters: {sorted(unknown)}")
+    values = [param_grid.get(k, [getattr(strategy, k)]) for k in TREND_GRID_PARAMS]
+    return pd.DataFrame(list(itertools.product(*values)), columns=TREND_GRID_PARAMS)
+
+
+def signal_codes(signal: pd.Series) -> np.ndarray:
+    """
+    int8 codes for a strategy signal column (SIGNAL_LONG / SIGNAL_FLAT), computed
+    once so the router gates compare integers. Categorical columns translate their
+    category codes instead of comparing strings per row.
+    """
+    if isinstance(signal.dtype, pd.CategoricalDtype):
+        codes = signal.cat.codes.to_numpy()
+        if signal.cat.categories.equals(SIGNAL_DTYPE.categories):
+            # Strategy output: the category codes already are the states (unordered
+            # dtypes compare equal in any category order, so check the order itself)
+            states = codes
+        else:
+            lut = (signal.cat.categories == SIGNAL_DTYPE.categories[SIGNAL_LONG]).astype(np.int8)
+            states = lut[codes]
+        # code -1 (missing) falls back to FLAT rather than reading as SIGNAL_CARRY
+        return np.where(codes >= 0, states, SIGNAL_FLAT).astype(np.int8)
+    return (signal.to_numpy() == SIGNAL_DTYPE.categories[SIGNAL_LONG]).astype(np.int8)
+
+
+def signal_labels(sig: np.ndarray) -> pd.Categorical:
+    """int8 states -> "FLAT"/"LONG" categorical for the output frame (no string copies)."""
+    return pd.Categorical.from_codes(sig, dtype=SIGNAL_DTYPE)
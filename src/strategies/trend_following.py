@@ -2,8 +2,11 @@ import pandas as pd
 import numpy as np
 from enum import Enum
 
-from src.features.technical import sma, atr
-from src.regime.regime_detector import MarketRegime
+from src.strategies._cli import run_cli
+from src.strategies.signal_kernels import (
+    SignalArrays, TrendGrid, TrendInputs, expand_trend_grid, prepare_trend_inputs,
+    run_trend_grid, run_trend_signals, signal_labels,
+)
 
 
 class TrendSignal(Enum):
@@ -12,6 +15,13 @@ class TrendSignal(Enum):
 
 
 class TrendFollowingStrategy:
+    # Sentiment band and stop mode shared by every code path (see trend_step):
+    # entry needs sent_exit < sentiment < sent_max, sentiment <= sent_exit forces
+    # FLAT, and `trail` trails/ratchets the stop while LONG
+    sent_exit = 0.5
+    sent_max = np.inf
+    trail = False
+
     def __init__(
         self,
         sma_fast_window: int = 20,
@@ -24,90 +34,72 @@ class TrendFollowingStrategy:
         self.atr_window = atr_window
         self.atr_stop_mult = atr_stop_mult
 
-    def generate_signals(self, df: pd.DataFrame) -> pd.DataFrame:
+    @classmethod
+    def prepare(cls, df: pd.DataFrame) -> TrendInputs:
         """
-        Generate trend-following signals with sentiment filtering and exit logic.
-        Requires 'regime' and 'sentiment_norm' columns in df.
+        Extract the input arrays once; pass the result to generate_signals in
+        place of df to reuse it across calls (sweeps, A/B comparisons).
         """
-
-        df = df.copy()
-
-        # --- Safety check ---
-        required_cols = ["close", "regime", "sentiment_norm"]
-        for col in required_cols:
-            if col not in df.columns:
-                raise ValueError(f"Missing required column: {col}")
-
-        # --- Indicators ---
-        df["sma_fast"] = sma(df["close"], self.sma_fast_window)
-        df["sma_slow"] = sma(df["close"], self.sma_slow_window)
-        df["atr"] = atr(df, self.atr_window)
-
-        # --- Initialize ---
-        df["signal"] = TrendSignal.FLAT.value
-        df["stop_price"] = np.nan
-
-        # --- Entry condition ---
-        long_condition = (
-            (df["sma_fast"] > df["sma_slow"])
-            & (df["regime"] == MarketRegime.TREND.value)
-            & (df["sentiment_norm"] > 0.5)  # only allow in Greed/Extreme Greed
+        return prepare_trend_inputs(df)
+
+    def _compute(self, inputs: TrendInputs):
+        """(int8 signal, stop_price, sma_fast, sma_slow, atr) arrays for prepared inputs."""
+        # --- Indicators + entry / exit / persistence / override in one compiled pass ---
+        # Entry: fast SMA above slow, TREND regime, sent_exit < sentiment < sent_max.
+        # Exit: sentiment <= sent_exit forces FLAT; stops persist alongside signals
+        # (and trail / ratchet while LONG when `trail` is set).
+        # SMA(fast), SMA(slow) and ATR come out of the same loop, so the bars are read once.
+        # Prepared inputs keep the indicators, so later calls with the same
+        # windows skip straight to the state machine.
+        return run_trend_signals(
+            inputs, self.sma_fast_window, self.sma_slow_window, self.atr_window,
+            self.atr_stop_mult, self.sent_exit, self.sent_max, self.trail,
         )
 
-        df.loc[long_condition, "signal"] = TrendSignal.LONG.value
-        df.loc[long_condition, "stop_price"] = (
-            df["close"] - df["atr"] * self.atr_stop_mult
+    def generate_signals(self, df: pd.DataFrame | TrendInputs) -> pd.DataFrame:
+        """
+        Generate trend-following signals with sentiment filtering and exit logic.
+        Requires 'high', 'low', 'close', 'regime' and 'sentiment_norm' columns in df.
+        """
+        # --- Safety check / array extraction (skipped for prepared inputs) ---
+        inputs = df if isinstance(df, TrendInputs) else prepare_trend_inputs(df)
+        signal, stop_price, sma_fast, sma_slow, atr_arr = self._compute(inputs)
+
+        return pd.DataFrame(
+            {
+                "signal": signal_labels(signal),
+                "stop_price": stop_price,
+                "sma_fast": sma_fast,
+                "sma_slow": sma_slow,
+                "atr": atr_arr,
+            },
+            index=inputs.index,
         )
 
-        # --- Exit condition ---
-        exit_condition = (
-            (df["sma_fast"] < df["sma_slow"])
-            | (df["sentiment_norm"] <= 0.5)  # sentiment drops out of Greed
-        )
-        df.loc[exit_condition, "signal"] = TrendSignal.FLAT.value
-        df.loc[exit_condition, "stop_price"] = np.nan
+    def generate_signals_arrays(self, df: pd.DataFrame | TrendInputs) -> SignalArrays:
+        """
+        Fast path for hot callers that only need the int8 signal codes and the
+        stops: same values as generate_signals, without building the DataFrame.
+        """
+        inputs = df if isinstance(df, TrendInputs) else prepare_trend_inputs(df)
+        signal, stop_price, *_ = self._compute(inputs)
+        return SignalArrays(signal, stop_price)
 
-        # --- Persist positions until exit ---
-        df["signal"] = (
-            df["signal"]
-            .replace(TrendSignal.FLAT.value, np.nan)
-            .ffill()
-            .fillna(TrendSignal.FLAT.value)
+    def generate_signals_grid(self, df: pd.DataFrame | TrendInputs, param_grid: dict) -> TrendGrid:
+        """
+        Signals for every combination of a parameter grid in one parallel run,
+        e.g. {"sma_fast_window": [10, 20], "atr_stop_mult": [1.5, 2.0, 3.0]};
+        parameters not in the grid keep this instance's values.
+        """
+        inputs = df if isinstance(df, TrendInputs) else prepare_trend_inputs(df)
+        params = expand_trend_grid(self, param_grid)
+        signal, stop_price = run_trend_grid(
+            inputs,
+            params["sma_fast_window"], params["sma_slow_window"], params["atr_window"],
+            params["atr_stop_mult"], self.sent_exit, self.sent_max, self.trail,
         )
-
-        # --- Sentiment override (force FLAT in Fear/Extreme Fear) ---
-        df.loc[df["sentiment_norm"] <= 0.5, "signal"] = TrendSignal.FLAT.value
-        df.loc[df["sentiment_norm"] <= 0.5, "stop_price"] = np.nan
-
-        # --- Persist stop prices alongside signals ---
-        df["stop_price"] = df["stop_price"].ffill()
-        df.loc[df["signal"] == TrendSignal.FLAT.value, "stop_price"] = np.nan
-
-        return df[
-            ["signal", "stop_price", "sma_fast", "sma_slow", "atr", "sentiment_norm"]
-        ]
+        return TrendGrid(params, signal, stop_price)
 
 
 if __name__ == "__main__":
-    df = pd.read_csv(
-        "data/btc_usdt_features.csv",
-        index_col=0,
-        parse_dates=True,
-    )
-
-    strat = TrendFollowingStrategy()
-    signals = strat.generate_signals(df)
-
-    print(signals.tail(20))
-    print("\nSignal distribution:")
-    print(signals["signal"].value_counts())
-
-    # --- Diagnostic: signals by sentiment bucket ---
-    print("\nSignals by sentiment bucket (refined):")
-    sentiment_bins = pd.cut(
-        signals["sentiment_norm"],
-        bins=[0, 0.25, 0.35, 0.5, 0.75, 1.0],
-        labels=["Extreme Fear", "Neutral", "Fear", "Greed", "Extreme Greed"]
-    )
-    diagnostic = signals.groupby(sentiment_bins)["signal"].value_counts()
-    print(diagnostic)
+    run_cli(TrendFollowingStrategy, "Generate trend-following signals on the feature set")
@@ -1,118 +1,120 @@
 import pandas as pd
 import numpy as np
-from enum import Enum
+from collections import deque
 
-from src.features.technical import sma, atr
 from src.regime.regime_detector import MarketRegime
-
-
-class TrendSignal(Enum):
-    LONG = "LONG"
-    FLAT = "FLAT"
-
-
-class TrendFollowingStrategy:
-    def __init__(
-        self,
-        sma_fast_window: int = 20,
-        sma_slow_window: int = 50,
-        atr_window: int = 14,
-        atr_stop_mult: float = 2.0,
-    ):
-        self.sma_fast_window = sma_fast_window
-        self.sma_slow_window = sma_slow_window
-        self.atr_window = atr_window
-        self.atr_stop_mult = atr_stop_mult
-
-    def generate_signals(self, df: pd.DataFrame) -> pd.DataFrame:
+from src.strategies import trend_following
+from src.strategies._cli import run_cli
+from src.strategies.signal_kernels import (
+    SIGNAL_FLAT, SIGNAL_LONG, running_sum_step, trend_step, true_range_step,
+)
+from src.strategies.trend_following import TrendSignal
+
+
+class TrendFollowingStrategy(trend_following.TrendFollowingStrategy):
+    """
+    Refined trend-following: entries only while sentiment is in (0.5, 0.65)
+    (0.35 <= s < 0.65, less the exit band), and LONG bars trail the stop behind
+    close by ATR * multiplier; it only ratchets up for the life of the position.
+    Everything else is the original strategy.
+    """
+
+    sent_max = 0.65
+    trail = True
+
+
+class _RunningWindow:
+    """
+    The last `size` values with a running sum, advanced by running_sum_step
+    in the same order as trend_signals, so means match the batch pass exactly.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.nan_count = 0
+
+    def push(self, value: float) -> float:
+        """Add one value; returns the window mean (NaN until full or with a NaN inside)."""
+        full = len(self.values) == self.size
+        leaving = self.values[0] if full else 0.0
+        self.total, self.nan_count = running_sum_step(self.total, self.nan_count, value, leaving, full)
+        self.values.append(value)
+        if len(self.values) < self.size or self.nan_count:
+            return np.nan
+        return self.total / self.size
+
+
+class IncrementalTrendStrategy(TrendFollowingStrategy):
+    """
+    Streaming form of the refined strategy for live use: update() consumes one
+    new bar and returns its signal and stop from running window sums, so each
+    bar costs O(1) instead of re-running the whole history. The per-bar true
+    range, window sums and state machine are the same compiled steps the batch
+    pass (generate_signals) runs, so both give the same results over the same
+    bars. Signals and stops are appended to preallocated buffers that double
+    when full.
+    """
+
+    def __init__(self, *args, capacity: int = 1024, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._fast = _RunningWindow(self.sma_fast_window)
+        self._slow = _RunningWindow(self.sma_slow_window)
+        self._atr = _RunningWindow(self.atr_window)
+        self._prev_close = np.nan
+        self._state = SIGNAL_FLAT
+        self._carried_stop = np.nan
+        self._n = 0
+        self._signal = np.empty(capacity, np.int8)
+        self._stop = np.empty(capacity, np.float64)
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def signal(self) -> np.ndarray:
+        """int8 SIGNAL_* codes of every bar seen so far (a view)."""
+        return self._signal[: self._n]
+
+    @property
+    def stop_price(self) -> np.ndarray:
+        """Stop of every bar seen so far (a view)."""
+        return self._stop[: self._n]
+
+    def update(self, high: float, low: float, close: float, regime, sentiment: float):
         """
-        Refined trend-following signals with sentiment filtering and trailing stop exits.
+        Advance one bar; regime may be a MarketRegime or its string value.
+        Returns (signal, stop_price) for the bar, signal as "LONG"/"FLAT".
         """
-
-        df = df.copy()
-
-        # --- Safety check ---
-        required_cols = ["close", "regime", "sentiment_norm"]
-        for col in required_cols:
-            if col not in df.columns:
-                raise ValueError(f"Missing required column: {col}")
-
-        # --- Indicators ---
-        df["sma_fast"] = sma(df["close"], self.sma_fast_window)
-        df["sma_slow"] = sma(df["close"], self.sma_slow_window)
-        df["atr"] = atr(df, self.atr_window)
-
-        # --- Initialize ---
-        df["signal"] = TrendSignal.FLAT.value
-        df["stop_price"] = np.nan
-
-        # --- Entry condition ---
-        long_condition = (
-            (df["sma_fast"] > df["sma_slow"])
-            & (df["regime"] == MarketRegime.TREND.value)
-            & (df["sentiment_norm"] >= 0.35)  # only allow in Greed/Extreme Greed
-            & (df["sentiment_norm"] < 0.65)
-        )
-
-        df.loc[long_condition, "signal"] = TrendSignal.LONG.value
-        df.loc[long_condition, "stop_price"] = (
-            df["close"] - df["atr"] * self.atr_stop_mult
-        )
-
-        # --- Exit condition ---
-        exit_condition = (
-            (df["sma_fast"] < df["sma_slow"])
-            | (df["sentiment_norm"] <= 0.5)  # sentiment drops out of Greed
-        )
-        df.loc[exit_condition, "signal"] = TrendSignal.FLAT.value
-        df.loc[exit_condition, "stop_price"] = np.nan
-
-        # --- Persist positions until exit ---
-        df["signal"] = (
-            df["signal"]
-            .replace(TrendSignal.FLAT.value, np.nan)
-            .ffill()
-            .fillna(TrendSignal.FLAT.value)
+        # --- Rolling indicators ---
+        tr = true_range_step(float(high), float(low), self._prev_close)
+        self._prev_close = float(close)
+        sma_fast = self._fast.push(float(close))
+        sma_slow = self._slow.push(float(close))
+        atr = self._atr.push(tr)
+
+        # --- Signal state (trend_step, as in generate_signals) ---
+        prev_sig = self._signal[self._n - 1] if self._n else SIGNAL_FLAT
+        prev_stop = self._stop[self._n - 1] if self._n else np.nan
+        is_trend = getattr(regime, "value", regime) == MarketRegime.TREND.value
+        self._state, self._carried_stop, signal, stop = trend_step(
+            self._state, self._carried_stop, prev_sig, prev_stop, float(close), is_trend,
+            float(sentiment), sma_fast, sma_slow, atr, self.atr_stop_mult,
+            self.sent_exit, self.sent_max, self.trail,
         )
 
-        # --- Sentiment override ---
-        df.loc[df["sentiment_norm"] <= 0.5, "signal"] = TrendSignal.FLAT.value
-        df.loc[df["sentiment_norm"] <= 0.5, "stop_price"] = np.nan
-
-        # --- Persist stop prices ---
-        df["stop_price"] = df["stop_price"].ffill()
-        df.loc[df["signal"] == TrendSignal.FLAT.value, "stop_price"] = np.nan
-
-        # --- Trailing stop update ---
-        trailing_stop = df["close"] - df["atr"] * self.atr_stop_mult
-        df.loc[df["signal"] == TrendSignal.LONG.value, "stop_price"] = np.maximum(
-            df["stop_price"], trailing_stop
-        )
+        # --- Append to the output buffers ---
+        if self._n == len(self._signal):
+            self._signal = np.concatenate([self._signal, np.empty_like(self._signal)])
+            self._stop = np.concatenate([self._stop, np.empty_like(self._stop)])
+        self._signal[self._n] = signal
+        self._stop[self._n] = stop
+        self._n += 1
 
-        return df[
-            ["signal", "stop_price", "sma_fast", "sma_slow", "atr", "sentiment_norm"]
-        ]
+        label = TrendSignal.LONG.value if signal == SIGNAL_LONG else TrendSignal.FLAT.value
+        return label, float(stop)
 
 
 if __name__ == "__main__":
-    df = pd.read_csv(
-        "data/btc_usdt_features.csv",
-        index_col=0,
-        parse_dates=True,
-    )
-
-    strat = TrendFollowingStrategy()
-    signals = strat.generate_signals(df)
-
-    print(signals.tail(20))
-    print("\nSignal distribution:")
-    print(signals["signal"].value_counts())
-
-    print("\nSignals by sentiment bucket:")
-    sentiment_bins = pd.cut(
-        signals["sentiment_norm"],
-        bins=[0, 0.25, 0.35, 0.5, 0.75, 1.0],
-        labels=["Extreme Fear", "Neutral", "Fear", "Greed", "Extreme Greed"]
-    )
-    diagnostic = signals.groupby(sentiment_bins)["signal"].value_counts()
-    print(diagnostic)
+    run_cli(TrendFollowingStrategy, "Generate refined trend-following signals on the feature set")